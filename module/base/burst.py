@@ -0,0 +1,31 @@
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+class BurstHandler:
+    """
+    突发事件处理器, 每次截图后由 Controls._burst 调用
+    - probe: 便宜的预判, 返回 False 就不再调用 handle
+    - handle: 完整的确认和处理, 处理了返回 True
+    - min_interval: 两次检查之间的最短间隔 (秒)
+    """
+
+    def __init__(self, name: str, handle: Callable[[], bool],
+                 probe: Optional[Callable[[np.ndarray], bool]] = None,
+                 min_interval: float = 0.) -> None:
+        self.name = name
+        self.handle = handle
+        self.probe = probe
+        self.min_interval = min_interval
+        self.last_check = 0.
+
+    def due(self, now: float) -> bool:
+        return now - self.last_check >= self.min_interval
+
+    def probe_hit(self, image: np.ndarray) -> bool:
+        """
+        :return: 没有探针时总是 True
+        """
+        self.last_check = time.time()
+        return self.probe is None or self.probe(image)
@@ -0,0 +1,41 @@
+from threading import Lock
+
+class TimingStats:
+    """
+    按名称统计耗时: 次数, 总耗时, 最长耗时
+    """
+
+    def __init__(self, name: str = '') -> None:
+        self.name = name
+        self.records: dict[str, list] = {}
+        self._lock = Lock()
+
+    def add(self, key: str, seconds: float) -> None:
+        with self._lock:
+            record = self.records.setdefault(key, [0, 0., 0.])
+            record[0] += 1
+            record[1] += seconds
+            record[2] = max(record[2], seconds)
+
+    def count(self, key: str) -> int:
+        record = self.records.get(key)
+        return record[0] if record else 0
+
+    def mean(self, key: str) -> float:
+        record = self.records.get(key)
+        return record[1] / record[0] if record else 0.
+
+    def summary(self, top: int = 10) -> str:
+        """
+        按总耗时排序, 返回前 top 个
+        """
+        with self._lock:
+            items = sorted(self.records.items(),
+                           key=lambda item: item[1][1], reverse=True)[:top]
+        lines = [f"{key}: count={count}, mean={total / count:.3f}s, max={longest:.3f}s"
+                 for key, (count, total, longest) in items]
+        return f"[{self.name}] " + "; ".join(lines)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.records.clear()
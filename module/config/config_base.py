@@ -16,6 +16,9 @@ class DeviceSetting(BaseModel):
     Attributes:
         serial (str): Device serial in format "host:port" (e.g., "127.0.0.1:16416")
         screenshot_method (ScreenshotMethod): Method to capture screenshots
+        stream_enable (bool): Capture frames continuously in a background thread
+        stream_fps (float): Target frame rate of the capture stream
+        stream_buffer_size (int): Ring buffer depth of the capture stream
         control_method (ControlMethod): Method to control device input
     """
 
@@ -24,6 +27,32 @@ class DeviceSetting(BaseModel):
         description="Device serial in format 'host:port' for ADB connection"
     )
 
+    screenshot_method: ScreenshotMethod = Field(
+        default=ScreenshotMethod.ADB_raw,
+        description="Screenshot backend. ADB_raw reads the raw framebuffer and "
+        "falls back to ADB_png if the raw frame cannot be parsed"
+    )
+
+    stream_enable: bool = Field(
+        default=False,
+        description="Keep a background capture stream running and read the latest frame "
+        "from it instead of calling screencap on every screenshot. Requires ADB_raw"
+    )
+
+    stream_fps: float = Field(
+        default=10,
+        ge=1,
+        le=30,
+        description="Target frame rate of the background capture stream"
+    )
+
+    stream_buffer_size: int = Field(
+        default=3,
+        ge=1,
+        le=10,
+        description="Number of recent frames kept by the background capture stream"
+    )
+
 class Optimization(BaseModel):
     """
     Performance optimization settings.
@@ -49,6 +78,59 @@ class Optimization(BaseModel):
         "Longer intervals reduce CPU usage during battles."
     )
 
+    adaptive_screenshot_interval: bool = Field(
+        default=True,
+        description="Slow down screenshots while the screen is static and speed up "
+        "while it is moving, within 0.5x - 2x of the configured interval."
+    )
+
+    ocr_warm_up: bool = Field(
+        default=True,
+        description="Load the OCR models and run one inference on a blank image in a background "
+        "thread at startup so the first OCR does not wait for them. When disabled they load on first use."
+    )
+
+    ocr_intra_op_threads: int = Field(
+        default=0,
+        ge=0,
+        le=16,
+        description="Threads used inside one ONNX Runtime operator for OCR. "
+        "0 uses the ONNX Runtime default (one per core). "
+        "Use 1-2 when several instances run on the same machine."
+    )
+
+    ocr_inter_op_threads: int = Field(
+        default=0,
+        ge=0,
+        le=16,
+        description="Threads used to run independent OCR operators in parallel. "
+        "Only used by the parallel execution mode. 0 uses the ONNX Runtime default."
+    )
+
+    ocr_graph_optimization: OcrGraphOptimization = Field(
+        default=OcrGraphOptimization.all,
+        description="ONNX Runtime graph optimization level for the OCR models."
+    )
+
+    ocr_execution_mode: OcrExecutionMode = Field(
+        default=OcrExecutionMode.sequential,
+        description="Run OCR operators one by one or independent ones in parallel."
+    )
+
+    ocr_cache_size: int = Field(
+        default=512,
+        ge=0,
+        le=4096,
+        description="Number of OCR results cached by the content of the cropped region. "
+        "An unchanged counter is not recognized again. 0 disables the cache."
+    )
+
+    ocr_cache_ttl: float = Field(
+        default=0,
+        ge=0,
+        description="Seconds an OCR cache entry stays valid. 0 keeps entries until they are evicted."
+    )
+
     # Task scheduling settings
     schedule_rule: ScheduleRule = Field(
         default=ScheduleRule.FIFO,
@@ -93,6 +175,11 @@ class ScriptSetting(BaseModel):
         description="Device connection and control settings"
     )
 
+    optimization: Optimization = Field(
+        default_factory=Optimization,
+        description="Performance optimization settings"
+    )
+
 class Scheduler(BaseModel):
     """
     Task scheduling configuration.
@@ -53,10 +53,22 @@ class GoryouLevel(str, Enum):
 
 class ScreenshotMethod(str, Enum):
     ADB_nc = "ADB_nc"
+    ADB_png = "ADB_png"  # screencap -p, 设备端PNG编码后再解码
+    ADB_raw = "ADB_raw"  # exec-out screencap, 直接读取原始帧缓冲
 
 class ControlMethod(str, Enum):
     minitouch = "minitouch"
 
+class OcrGraphOptimization(str, Enum):
+    disable = "disable"  # 不优化计算图
+    basic = "basic"  # 常量折叠, 删除多余节点
+    extended = "extended"  # 再加上算子融合
+    all = "all"  # 再加上内存布局优化, onnxruntime 的默认值
+
+class OcrExecutionMode(str, Enum):
+    sequential = "sequential"  # 算子逐个执行
+    parallel = "parallel"  # 没有依赖的算子并行执行, 使用 inter_op 线程
+
 class ErrorHandleMethod(str, Enum):
     wait_10s = "等待10秒"
     restart = "重启"
@@ -2,12 +2,26 @@ from typing import Optional
 from ppadb.client import Client as AdbClient
 import numpy as np
 import cv2
+import itertools
+import re
 import subprocess
 import time
 
 from module.base.logger import logger, set_current_config_name
 from module.config.config import Config
+from module.config.enums import ScreenshotMethod
+from module.control.server.framebuffer import decode_raw_frame, detect_header_size
+from module.control.server.frame_stream import FrameStream
+from module.control.server.rate_governor import RateGovernor
+from module.image_processing.match_cache import MatchCache
+from module.image_processing.frame import Frame
+from module.image_processing import fingerprint
+from module.image_processing import resolution
+from module.image_processing import ocr_engine
+from module.image_processing.ocr_cache import ocr_cache
+from module.image_processing.rule_image import fast_path_stats
 from module.base.timer import Timer
+from module.base.stats import TimingStats
 from collections import deque
 from module.base.exception import DeviceNotRunningError, GameStuckError, GameTooManyClickError
 
@@ -19,6 +33,12 @@ class Device:
     adb: AdbClient
     device = None
     screenshot = None
+    screenshot_time: float = 0  # 当前截图的时间戳
+    frame_id: int = 0  # 当前截图的编号, 每一帧新画面递增
+    frame: Optional[Frame] = None  # 当前截图和它的灰度图/缩小图等派生图片
+    frame_counter = itertools.count(1)  # 所有设备共用, 保证编号不重复
+    input_time: float = 0  # 最后一次点击/滑动的时间戳
+    stream: Optional[FrameStream] = None
     config: Config
     detect_record = set()
     click_record = deque(maxlen=15)
@@ -32,7 +52,18 @@ class Device:
         self.config_name = config_name  # 保存配置名称
         self.config = Config(config_name=config_name)
         self._split_serial(self.config.model.script.device.serial)
+        self.screenshot_method = self.config.model.script.device.screenshot_method
+        self._raw_header_size: Optional[int] = None
+        self._stream_enable = self.config.model.script.device.stream_enable
+        self.match_cache = MatchCache()
+        self.click_ack = TimingStats('ClickAck')  # 每个按钮点击后到画面响应的时间
+        self.burst_time = TimingStats('Burst')  # 截图后突发事件检测的耗时
+        optimization = self.config.model.script.optimization
+        self.governor = RateGovernor(optimization.screenshot_interval,
+                                     optimization.combat_screenshot_interval,
+                                     optimization.adaptive_screenshot_interval)
         self.device = self.connect_device()
+        self.detect_input_size()
 
     def _split_serial(self, serial: str):
         """Split the serial number into host and port."""
@@ -104,6 +135,25 @@ class Device:
             raise DeviceNotRunningError()
         return self.device
 
+    def detect_input_size(self):
+        """
+        模拟器屏幕的大小, 点击坐标按这个大小换算
+        有 Override size 时用它, 横屏时宽比高大
+        """
+        if self.device is None:
+            return
+        try:
+            output = self.device.shell("wm size")
+        except Exception as e:
+            logger.warning(f"[Device] Failed to get screen size: {e}")
+            return
+        sizes = re.findall(r'(\d+)x(\d+)', output or '')
+        if not sizes:
+            logger.warning(f"[Device] Unknown screen size: {output}")
+            return
+        w, h = (int(v) for v in sizes[-1])
+        resolution.set_input_size(max(w, h), min(w, h), owner=self)
+
     def stuck_record_add(self, button):
         """
         当你要设置这个时候检测为长时间的时候，你需要在这里添加
@@ -177,13 +227,107 @@ class Device:
 
     def decode_image(self, image):
         """Decode the image."""
-        image_bytes = np.array(image, dtype=np.uint8)
-        image = cv2.imdecode(np.frombuffer(
-            image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        return cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+
+    def screenshot_png(self):
+        """
+        screencap -p, 设备端编码PNG, 本地再解码
+        """
+        image = self.device.screencap()
+        return self.decode_image(image)
+
+    def screenshot_raw(self):
+        """
+        exec-out screencap, 直接读取原始RGBA帧缓冲, 省去PNG编码和解码
+        """
+        conn = self.device.create_connection()
+        with conn:
+            conn.send("exec:screencap")
+            data = conn.read_all()
+
+        if self._raw_header_size is None:
+            self._raw_header_size = detect_header_size(data)
+            logger.background(
+                f"[Device] Raw screenshot header size: {self._raw_header_size}")
+        return decode_raw_frame(data, self._raw_header_size)
+
+    def start_stream(self) -> bool:
+        """
+        启动后台截图线程, 需要使用 ADB_raw 截图方式
+        """
+        if self.stream is not None:
+            return True
+        if self.screenshot_method != ScreenshotMethod.ADB_raw:
+            logger.warning(
+                f"[Device] Capture stream requires ADB_raw, got {self.screenshot_method}")
+            return False
+        if self._raw_header_size is None:
+            # 先截一次图, 确定原始帧的头部长度
+            self.screenshot_raw()
+
+        setting = self.config.model.script.device
+        self.stream = FrameStream(self.device, self._raw_header_size,
+                                  fps=setting.stream_fps,
+                                  buffer_size=setting.stream_buffer_size).start()
+        return True
+
+    def stop_stream(self):
+        if self.stream is None:
+            return
+        self.stream.stop()
+        self.stream = None
+
+    def _capture(self):
+        """
+        单次截图
+        """
+        image = None
+        if self.screenshot_method == ScreenshotMethod.ADB_raw:
+            try:
+                image = self.screenshot_raw()
+            except Exception as e:
+                # 原始帧无法解析时退回PNG截图, 本次运行不再尝试
+                logger.warning(
+                    f"[Device] Raw screenshot failed, fallback to PNG: {e}")
+                self.screenshot_method = ScreenshotMethod.ADB_png
+                self._raw_header_size = None
+
+        if image is None:
+            image = self.screenshot_png()
         return image
 
-    def get_screenshot(self):
+    def _stream_frame(self, newer_than: float):
+        """
+        从后台截图线程取一帧, 取不到返回None
+        """
+        if self._stream_enable and self.stream is None:
+            # 只尝试启动一次
+            self._stream_enable = False
+            try:
+                self.start_stream()
+            except Exception as e:
+                logger.warning(f"[Device] Failed to start capture stream: {e}")
+                self.stop_stream()
+
+        if self.stream is None:
+            return None
+        if not self.stream.running:
+            logger.warning("[Device] Capture stream stopped, use single screenshot")
+            self.stop_stream()
+            return None
+
+        timeout = max(1.0, 3 / self.stream.fps)
+        frame = self.stream.get(newer_than=newer_than, timeout=timeout)
+        if frame is None:
+            logger.warning("[Device] Capture stream timeout, use single screenshot")
+        return frame
+
+    def get_screenshot(self, newer_than: Optional[float] = None):
         """
+        Args:
+            newer_than (float, optional): 开启后台截图时, 等待比这个时间戳更新的帧.
+                默认为最后一次点击/滑动的时间, 保证拿到的是操作之后的画面
+
         Returns:
             np.ndarray:
         """
@@ -193,11 +337,57 @@ class Device:
         if self.device is None:
             logger.error("Error: no device detected")
             return
-        image = self.device.screencap()
-        image = self.decode_image(image)
+
+        if newer_than is None:
+            newer_than = self.input_time
+
+        # 所有截图都经过频率控制
+        self.governor.wait(self.input_time)
+        frame = self._stream_frame(newer_than)
+        if frame is not None:
+            image, timestamp = frame.image, frame.timestamp
+        else:
+            image, timestamp = self._capture(), time.time()
+
+        # 后台截图线程可能返回同一帧, 这时保留编号和匹配缓存
+        if image is not self.screenshot:
+            signature = fingerprint.signature(image)
+            prev = self.match_cache.signature
+            motion = fingerprint.motion(prev, signature) if prev is not None else None
+            # 截图大小变了 (第一次截图或者换了分辨率) 时缩放所有的资源
+            resolution.set_size(image.shape[1], image.shape[0], owner=self)
+            self.frame_id = next(self.frame_counter)
+            self.match_cache.reset(self.frame_id, signature)
+            # 上一帧的派生图片不会再用到
+            if self.frame is not None:
+                self.frame.release()
+            self.frame = Frame(image, self.frame_id)
+            self.governor.record(motion)
+        else:
+            self.governor.record()
         self.screenshot = image
+        self.screenshot_time = timestamp
         return image
 
+    def log_stats(self):
+        """
+        输出截图和识别相关的统计信息
+        """
+        logger.background(f"[MatchCache] {self.match_cache.stats}")
+        logger.background(f"[Governor] {self.governor.stats}")
+        if self.click_ack.records:
+            logger.background(self.click_ack.summary())
+        if self.burst_time.records:
+            logger.background(self.burst_time.summary())
+        if fast_path_stats.records:
+            # 按任务统计, 输出后清空
+            logger.background(fast_path_stats.summary(top=20))
+            fast_path_stats.clear()
+        if self.stream is not None:
+            logger.background(f"[Stream] {self.stream.stats}")
+        logger.background(f"[OCR] {ocr_engine.stats()}")
+        logger.background(f"[OcrCache] {ocr_cache().stats}")
+
     def capture_screenshot(self, filepath) -> bool:
         """Capture the screenshot."""
         # 设置当前配置名称上下文，确保日志能正确关联
@@ -220,7 +410,9 @@ class Device:
             logger.error("Cannot click - no device connected")
             return
         logger.background(f"[Device] Click {name}: {x} {y}.")
+        x, y = resolution.to_input(x, y)
         self.device.shell("input tap {} {}".format(x, y))
+        self.input_time = time.time()
 
     def long_click(self, x: float, y: float, duration: float = 1500):
         if self.device is None:
@@ -229,16 +421,19 @@ class Device:
 
         logger.background(
             f"[Device] Long Click {x} {y} in {duration}.")
+        x, y = resolution.to_input(x, y)
 
         self.device.shell(
             "input swipe {} {} {} {} {}".format(x, y, x, y, duration))
+        self.input_time = time.time()
 
     def random_click(self, x, y, w, h):
         """Random click within a rectangle."""
         if self.device is None:
             logger.error("Cannot click - no device connected")
             return
-        if (x < 0 or y < 0 or x + w > 1280 or y + h > 720):
+        width, height = resolution.size()
+        if (x < 0 or y < 0 or x + w > width or y + h > height):
             logger.error("Invalid rectangle.")
             return
         x = np.random.randint(x, x + w)
@@ -252,6 +447,8 @@ class Device:
             return
         logger.background(
             f"[Device] Swipe from ({start_x},{start_y}) to ({end_x},{end_y}) in {duration}.")
+        start_x, start_y = resolution.to_input(start_x, start_y)
+        end_x, end_y = resolution.to_input(end_x, end_y)
         self.device.shell("input swipe {} {} {} {} {}".format(
             start_x,
             start_y,
@@ -259,6 +456,7 @@ class Device:
             end_y,
             duration
         ))
+        self.input_time = time.time()
 
 
 if __name__ == "__main__":
@@ -9,6 +9,7 @@ import cv2
 from module.base.exception import DeviceNotRunningError, RequestHumanTakeover
 from module.config.config import Config
 from module.image_processing.image_processor import ImageProcessor
+from module.image_processing import resolution
 from module.base.logger import GameConsoleLogger
 from module.control.server.device import Device
 
@@ -186,10 +187,10 @@ class EmulatorMain:
     def login(self, device: Device):
         screenshot = device.get_screenshot()
         pro = ImageProcessor(screenshot)
-        image = cv2.imread(self.get_image_path('login_warning.png'))
+        image = resolution.template(cv2.imread(self.get_image_path('login_warning.png')))
         result = pro.find_target(image)
         if result:
-            device.click(600, 600, "login")
+            device.click(*resolution.point(600, 600), "login")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+from module.base.logger import logger
+from module.control.server.framebuffer import (FramebufferError, decode_raw_frame,
+                                               frame_size, parse_header)
+
+class StreamFrame:
+    """环形缓冲区中的一帧"""
+    __slots__ = ('timestamp', 'image', 'consumed')
+
+    def __init__(self, timestamp: float, image: np.ndarray) -> None:
+        self.timestamp = timestamp
+        self.image = image
+        self.consumed = False
+
+class FrameStream:
+    """
+    后台截图线程
+    通过一条长连接的 exec-out 循环执行 screencap, 持续把最新的帧写进一个小的环形缓冲区,
+    截图和图像识别可以同时进行, 不用再串行等待ADB
+    """
+
+    # 连续失败这么多次就放弃, 由Device退回到单次截图
+    max_failures = 5
+    # 帧头到达之前画面已经截取了, 时间戳至少往前推这么多 (秒)
+    min_capture_latency = 0.05
+
+    def __init__(self, device, header_size: int, fps: float = 10, buffer_size: int = 3) -> None:
+        """
+        :param device: ppadb 的 device 对象
+        :param header_size: 原始帧头部长度 (12 或 16)
+        :param fps: 目标帧率
+        :param buffer_size: 环形缓冲区深度
+        """
+        self.device = device
+        self.header_size = header_size
+        self.fps = fps
+        self.buffer: deque[StreamFrame] = deque(maxlen=max(1, buffer_size))
+        self.condition = threading.Condition()
+
+        self.produced = 0  # 收到的帧数
+        self.dropped = 0  # 没被使用就被挤出缓冲区的帧数
+        self.reused = 0  # 同一帧被重复返回的次数
+        self.failed = False
+
+        self._conn = None
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._running and not self.failed
+
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name='FrameStream', daemon=True)
+        self._thread.start()
+        logger.background(
+            f"[Stream] Started, fps: {self.fps}, buffer: {self.buffer.maxlen}")
+        return self
+
+    def stop(self):
+        self._running = False
+        conn = self._conn
+        if conn is not None:
+            conn.close()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+        with self.condition:
+            self.condition.notify_all()
+        logger.background(f"[Stream] Stopped. {self.stats}")
+
+    @property
+    def stats(self) -> str:
+        return f"produced: {self.produced}, dropped: {self.dropped}, reused: {self.reused}"
+
+    def _command(self) -> str:
+        interval = 1 / self.fps if self.fps > 0 else 0
+        return f"exec:sh -c 'while true; do screencap; sleep {interval:.3f}; done'"
+
+    @property
+    def capture_latency(self) -> float:
+        """
+        截取画面到帧头到达的最长时间, 按一帧的间隔估计
+        """
+        interval = 1 / self.fps if self.fps > 0 else 0
+        return max(interval, self.min_capture_latency)
+
+    def _read_exact(self, view: memoryview) -> bool:
+        """把数据读满view, 连接断开返回False"""
+        sock = self._conn.socket
+        received = 0
+        total = len(view)
+        while received < total:
+            n = sock.recv_into(view[received:])
+            if n == 0:
+                return False
+            received += n
+        return True
+
+    def _run(self):
+        failures = 0
+        while self._running:
+            produced = self.produced
+            try:
+                self._stream()
+                failures = 0 if self.produced > produced else failures + 1
+            except (OSError, RuntimeError, FramebufferError) as e:
+                if not self._running:
+                    break
+                failures += 1
+                logger.warning(f"[Stream] Capture stream error: {e}")
+            finally:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+
+            if failures >= self.max_failures:
+                logger.error("[Stream] Too many stream failures, disabled")
+                self.failed = True
+                with self.condition:
+                    self.condition.notify_all()
+                break
+            time.sleep(0.5 * failures)
+
+    def _stream(self):
+        self._conn = self.device.create_connection()
+        self._conn.send(self._command())
+
+        header = bytearray(self.header_size)
+        header_view = memoryview(header)
+        buffer = bytearray()
+        while self._running:
+            if not self._read_exact(header_view):
+                return
+            # 时间戳取帧头到达的时间再减去一帧的间隔, 不用读完像素的时间
+            # 点击之前开始截取的帧不会比 Device.input_time 新
+            timestamp = time.time() - self.capture_latency
+            width, height, pixel_format = parse_header(header)
+            size = self.header_size + frame_size(width, height, pixel_format)
+            if len(buffer) != size:
+                buffer = bytearray(size)
+            view = memoryview(buffer)
+            view[:self.header_size] = header
+            if not self._read_exact(view[self.header_size:]):
+                return
+
+            # 像素缓冲区会被下一帧复用, decode_raw_frame 的通道转换会生成新数组
+            image = decode_raw_frame(buffer, self.header_size)
+            self._push(StreamFrame(timestamp, image))
+
+    def _push(self, frame: StreamFrame):
+        with self.condition:
+            if len(self.buffer) == self.buffer.maxlen and not self.buffer[0].consumed:
+                self.dropped += 1
+            self.buffer.append(frame)
+            self.produced += 1
+            self.condition.notify_all()
+
+    def get(self, newer_than: Optional[float] = None, timeout: float = 1.0) -> Optional[StreamFrame]:
+        """
+        获取最新的一帧
+        :param newer_than: 如果指定, 阻塞直到有比这个时间戳更新的帧
+        :param timeout: 最长等待时间
+        :return: StreamFrame, 超时或线程已停止返回None
+        """
+        deadline = time.time() + timeout
+        with self.condition:
+            while self.running:
+                if self.buffer:
+                    frame = self.buffer[-1]
+                    if newer_than is None or frame.timestamp > newer_than:
+                        if frame.consumed:
+                            self.reused += 1
+                        frame.consumed = True
+                        return frame
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+        return None
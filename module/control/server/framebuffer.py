@@ -0,0 +1,75 @@
+import struct
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# screencap 输出的原始帧格式 (android PixelFormat)
+PIXEL_FORMAT_RGBA_8888 = 1
+PIXEL_FORMAT_RGBX_8888 = 2
+PIXEL_FORMAT_RGB_888 = 3
+PIXEL_FORMAT_BGRA_8888 = 5
+
+# 每种格式对应 (每像素字节数, 转BGR的cv2转换码)
+PIXEL_FORMATS = {
+    PIXEL_FORMAT_RGBA_8888: (4, cv2.COLOR_RGBA2BGR),
+    PIXEL_FORMAT_RGBX_8888: (4, cv2.COLOR_RGBA2BGR),
+    PIXEL_FORMAT_RGB_888: (3, cv2.COLOR_RGB2BGR),
+    PIXEL_FORMAT_BGRA_8888: (4, cv2.COLOR_BGRA2BGR),
+}
+
+# 旧版本只有 width, height, format 三个字段; Android 9+ 额外带一个 dataspace
+HEADER_SIZES = (12, 16)
+
+class FramebufferError(Exception):
+    pass
+
+def parse_header(data) -> tuple[int, int, int]:
+    """
+    解析 screencap 原始输出的头部
+    :param data: 至少12字节
+    :return: (width, height, format)
+    """
+    if len(data) < 12:
+        raise FramebufferError(f"Raw frame too short: {len(data)} bytes")
+    return struct.unpack_from('<III', data, 0)
+
+def frame_size(width: int, height: int, pixel_format: int) -> int:
+    """像素数据的字节数"""
+    if pixel_format not in PIXEL_FORMATS:
+        raise FramebufferError(f"Unsupported pixel format: {pixel_format}")
+    bpp, _ = PIXEL_FORMATS[pixel_format]
+    return width * height * bpp
+
+def detect_header_size(data) -> int:
+    """
+    根据数据总长度判断头部是12字节还是16字节
+    """
+    width, height, pixel_format = parse_header(data)
+    size = frame_size(width, height, pixel_format)
+    header_size = len(data) - size
+    if header_size not in HEADER_SIZES:
+        raise FramebufferError(
+            f"Unexpected raw frame length {len(data)} for {width}x{height} format {pixel_format}")
+    return header_size
+
+def decode_raw_frame(data, header_size: Optional[int] = None) -> np.ndarray:
+    """
+    把 screencap 原始输出转换成 BGR 图片
+    像素部分用 np.frombuffer 直接引用, 只做一次通道转换
+    :param data: bytes / bytearray / memoryview
+    :param header_size: 已知的头部长度, None 则自动判断
+    :return: np.ndarray (h, w, 3)
+    """
+    if header_size is None:
+        header_size = detect_header_size(data)
+    width, height, pixel_format = parse_header(data)
+    size = frame_size(width, height, pixel_format)
+    if len(data) < header_size + size:
+        raise FramebufferError(
+            f"Raw frame truncated: {len(data)} < {header_size + size}")
+
+    bpp, code = PIXEL_FORMATS[pixel_format]
+    pixels = np.frombuffer(data, dtype=np.uint8, count=size, offset=header_size)
+    pixels = pixels.reshape((height, width, bpp))
+    return cv2.cvtColor(pixels, code)
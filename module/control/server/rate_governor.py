@@ -0,0 +1,122 @@
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from module.base.logger import logger
+
+class RateGovernor:
+    """
+    截图频率控制, 每一次截图前都会经过这里
+    - 普通模式使用 screenshot_interval, 战斗模式使用 combat_screenshot_interval
+    - 开启自适应时根据相邻两帧的变化程度调整间隔: 画面静止时放慢, 画面在动时加快
+    - 点击/滑动之后的第一次截图不等待, 尽快看到操作的结果
+    - 等待条件 (Controls.wait_for, 确认点击) 有自己的检查间隔, 期间不再额外等待
+    """
+
+    NORMAL = 'normal'
+    COMBAT = 'combat'
+
+    # 自适应时间隔的缩放范围
+    min_factor = 0.5
+    max_factor = 2.0
+    # 相邻两帧指纹的平均差异, 低于 static_motion 算静止, 高于 moving_motion 算在动
+    static_motion = 0.5
+    moving_motion = 4.0
+
+    def __init__(self, interval: float, combat_interval: float, adaptive: bool = False) -> None:
+        self.intervals = {self.NORMAL: interval, self.COMBAT: combat_interval}
+        self.adaptive = adaptive
+        self.mode = self.NORMAL
+        self.factor = 1.0
+        self.last_capture = 0.
+        self._exempt = 0  # 嵌套的 exempt 层数
+
+        # 每种模式的截图次数和持续时间
+        self.captures = {self.NORMAL: 0, self.COMBAT: 0}
+        self.durations = {self.NORMAL: 0., self.COMBAT: 0.}
+        self._mode_start = time.time()
+
+    @property
+    def interval(self) -> float:
+        base = self.intervals[self.mode]
+        return base * self.factor if self.adaptive else base
+
+    def set_mode(self, mode: str) -> str:
+        """
+        切换模式, 返回之前的模式
+        """
+        previous = self.mode
+        if mode == previous:
+            return previous
+        now = time.time()
+        self.durations[previous] += now - self._mode_start
+        self._mode_start = now
+        self.mode = mode
+        self.factor = 1.0
+        logger.background(f"[Governor] Switch to {mode} mode, interval: {self.interval:.2f}s")
+        return previous
+
+    @contextmanager
+    def combat(self):
+        """
+        with device.governor.combat():
+            ...
+        """
+        previous = self.set_mode(self.COMBAT)
+        try:
+            yield self
+        finally:
+            self.set_mode(previous)
+
+    @contextmanager
+    def exempt(self):
+        """
+        自己控制检查间隔的等待循环里截图不经过频率控制
+        with device.governor.exempt():
+            ...
+        """
+        self._exempt += 1
+        try:
+            yield self
+        finally:
+            self._exempt -= 1
+
+    def wait(self, input_time: float = 0.) -> None:
+        """
+        截图前调用, 距离上一次截图不到 interval 就等待
+        :param input_time: 最后一次点击/滑动的时间, 在上一次截图之后有操作就不等待
+        """
+        if self._exempt or input_time > self.last_capture:
+            return
+        remain = self.last_capture + self.interval - time.time()
+        if remain > 0:
+            time.sleep(remain)
+
+    def record(self, motion: Optional[float] = None) -> None:
+        """
+        截图后调用
+        :param motion: 和上一帧相比的变化程度, None 表示不知道
+        """
+        self.last_capture = time.time()
+        self.captures[self.mode] += 1
+        if not self.adaptive or motion is None:
+            return
+        if motion < self.static_motion:
+            self.factor = min(self.factor * 1.25, self.max_factor)
+        elif motion > self.moving_motion:
+            self.factor = self.min_factor
+        else:
+            self.factor = 1.0
+
+    def rates(self) -> dict[str, float]:
+        """每种模式实际的截图次数/秒"""
+        durations = dict(self.durations)
+        durations[self.mode] += time.time() - self._mode_start
+        return {mode: self.captures[mode] / durations[mode] if durations[mode] > 0 else 0.
+                for mode in self.captures}
+
+    @property
+    def stats(self) -> str:
+        rates = self.rates()
+        return ", ".join(f"{mode}: {self.captures[mode]} captures, {rates[mode]:.2f}/s"
+                         for mode in self.captures)
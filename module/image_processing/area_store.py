@@ -0,0 +1,123 @@
+"""
+学习到的匹配区域
+记录每个 RuleImage 实际匹配到的位置, 用这些位置的范围加上边距作为更小的搜索区域
+保存在 configs/cache 下, 重启之后继续使用
+"""
+import json
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+from module.base.logger import logger
+
+STORE_FILE = './configs/cache/learned_areas.json'
+# 至少匹配到几次才使用学习到的区域
+MIN_SAMPLES = 3
+# 学习到的区域向外扩展的像素
+MARGIN = 10
+# 学习到的区域超过原区域这个比例就没有必要使用
+MAX_RATIO = 0.8
+
+class AreaStore:
+
+    def __init__(self, file: str = STORE_FILE) -> None:
+        """
+        key 是资源名和 json 里声明的 area, value 是 [匹配次数, x1, y1, x2, y2]
+        x1, y1, x2, y2 是所有匹配位置 (左上角) 的范围
+        """
+        self.file = Path(file)
+        self.records: dict[str, list] = self.load()
+        self.dirty = False
+        self._lock = Lock()
+
+    @staticmethod
+    def key(name: str, area) -> str:
+        return f"{name}@{','.join(str(int(v)) for v in area)}"
+
+    def load(self) -> dict[str, list]:
+        if not self.file.is_file():
+            return {}
+        try:
+            with open(self.file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[Area] Failed to load learned areas: {e}")
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def record(self, key: str, loc: tuple) -> None:
+        """
+        记录一次匹配位置
+        """
+        x, y = int(loc[0]), int(loc[1])
+        with self._lock:
+            record = self.records.get(key)
+            if record is None:
+                self.records[key] = [1, x, y, x, y]
+            else:
+                record[0] += 1
+                record[1:] = [min(record[1], x), min(record[2], y),
+                              max(record[3], x), max(record[4], y)]
+            self.dirty = True
+
+    def window(self, key: str, area, size: tuple) -> Optional[tuple]:
+        """
+        学习到的搜索区域, 限制在原区域内
+        :param area: json 里声明的 area
+        :param size: (w, h) 模板大小
+        :return: (x, y, w, h), 次数不够或者区域没有变小时返回None
+        """
+        record = self.records.get(key)
+        if record is None or record[0] < MIN_SAMPLES:
+            return None
+        ax, ay, aw, ah = [int(v) for v in area]
+        w, h = size
+        x1, y1 = max(ax, record[1] - MARGIN), max(ay, record[2] - MARGIN)
+        x2 = min(ax + aw, record[3] + w + MARGIN)
+        y2 = min(ay + ah, record[4] + h + MARGIN)
+        if x2 - x1 < w or y2 - y1 < h:
+            return None
+        if (x2 - x1) * (y2 - y1) > aw * ah * MAX_RATIO:
+            return None
+        return x1, y1, x2 - x1, y2 - y1
+
+    def save(self) -> None:
+        """
+        和文件里的记录合并之后保存, 多个进程共用一个文件
+        """
+        with self._lock:
+            if not self.dirty:
+                return
+            records = self.load()
+            for key, record in self.records.items():
+                saved = records.get(key)
+                if saved is None:
+                    continue
+                # 文件里可能有其他进程新增的位置, 取两者的范围
+                record[1:] = [min(record[1], saved[1]), min(record[2], saved[2]),
+                              max(record[3], saved[3]), max(record[4], saved[4])]
+                record[0] = max(record[0], saved[0])
+            records.update(self.records)
+            self.records = records
+
+            self.file.parent.mkdir(parents=True, exist_ok=True)
+            temp = self.file.with_suffix('.tmp')
+            with open(temp, 'w', encoding='utf-8', newline='\n') as f:
+                json.dump(records, f, indent=2)
+            os.replace(temp, self.file)
+            self.dirty = False
+
+_store: Optional[AreaStore] = None
+_store_lock = Lock()
+
+def area_store() -> AreaStore:
+    """
+    所有 RuleImage 共用的区域记录, 第一次使用时读取
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AreaStore()
+    return _store
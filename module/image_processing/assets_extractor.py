@@ -3,6 +3,7 @@ import json
 from tqdm.contrib.concurrent import process_map
 from pathlib import Path
 from module.base.logger import logger
+from module.image_processing.template_atlas import build_atlas
 
 MODULE_FOLDER = 'tasks'
 ASSETS_FILE = 'assets.py'
@@ -12,6 +13,7 @@ from module.image_processing.rule_image import RuleImage
 from module.image_processing.rule_ocr import RuleOcr
 from module.image_processing.rule_swipe import RuleSwipe
 from module.image_processing.rule_click import RuleClick
+from module.image_processing.rule_color import RuleColor
 
 # This file was automatically generated by ./module/impage_processing/assets_extractor.py.
 # Don't modify it manually.
@@ -126,7 +128,11 @@ class OcrExtractor:
             f'\t\troi=({item["roi"]}),\n' \
             f'\t\tarea=({item["area"]}),\n' \
             f'\t\tkeyword="{item["keyword"]}",\n' \
-            f'\t\tname="{item["name"]}"\n\t)\n'
+            f'\t\tname="{item["name"]}"'
+        # 可选: 只有数字的区域先用字形模板读取
+        if item.get("digits"):
+            name += ',\n\t\tdigits=True'
+        name += '\n\t)\n'
         return description + name
 
 class ClickExtractor:
@@ -157,6 +163,41 @@ class ClickExtractor:
             f'name="{item["name"]}")\n'
         return description + name
 
+class ColorExtractor:
+
+    def __init__(self, data: list) -> None:
+        """
+        color rule 提取
+        :param data:  json解析后的数据
+        """
+        self._result = '\n\t# Color Rule Assets\n'
+        for item in data:
+            self._result += self.extract_item(item)
+
+    @property
+    def result(self) -> str:
+        return self._result
+
+    def extract_item(self, item) -> str:
+        """
+        解析每一项，返回字符串
+        color 是 "r, g, b", tolerance 和 ratio 可选
+        :param item:
+        :return:
+        """
+        description: str = f'\t# {item["description"]} \n'
+        name: str = f'\tP_{name_transform(item["name"])} = RuleColor(\n' \
+            f'\t\tname="{item["name"]}",\n' \
+            f'\t\troi=({item["roi"]}),\n' \
+            f'\t\tarea=({item["area"]}),\n' \
+            f'\t\tcolor=({item["color"]})'
+        if "tolerance" in item:
+            name += f',\n\t\ttolerance={item["tolerance"]}'
+        if "ratio" in item:
+            name += f',\n\t\tratio={item["ratio"]}'
+        name += '\n\t)\n'
+        return description + name
+
 class AssetsExtractor:
     def __init__(self, task_path: str) -> None:
         """
@@ -229,6 +270,8 @@ class AssetsExtractor:
                 result += SwipeExtractor(data).result
             elif data_type == 'click':
                 result += ClickExtractor(data).result
+            elif data_type == 'color':
+                result += ColorExtractor(data).result
 
         self._result += result
         self._result += '\n\n'
@@ -262,3 +305,4 @@ class AllAssetsExtractor:
 
 if __name__ == "__main__":
     AllAssetsExtractor()
+    build_atlas()
@@ -0,0 +1,231 @@
+"""
+匹配方式的性能和准确度测试, 在保存下来的截图上运行
+Format: py -m module.image_processing.benchmark [name] [frames_folder]
+"""
+import importlib
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+import cv2
+import numpy as np
+
+from module.base.logger import logger
+from module.image_processing import match_pool
+from module.image_processing import resolution
+from module.image_processing import tiling
+from module.image_processing.match_engine import get_engine
+from module.image_processing.rule_image import RuleImage
+
+MODULE_FOLDER = 'tasks'
+FRAMES_FOLDER = './frames'
+# 匹配成功的阈值, 和 Controls.appear 的默认值一样
+THRESHOLD = 0.9
+# 两种方式找到的位置相差不超过这个值就算一样
+LOCATION_TOLERANCE = 2
+
+BENCHMARKS: dict[str, Callable] = {}
+
+def benchmark(name: str):
+    """
+    注册一个测试, 函数的参数是 (frames, rules)
+    """
+    def register(func: Callable) -> Callable:
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+def load_frames(folder: str = FRAMES_FOLDER) -> list[tuple[str, np.ndarray]]:
+    """
+    读取文件夹下所有的 png 截图
+    """
+    frames = []
+    for file in sorted(Path(folder).glob('*.png')):
+        image = cv2.imread(str(file))
+        if image is not None:
+            frames.append((file.name, image))
+    return frames
+
+def load_rules(module_folder: str = MODULE_FOLDER) -> list[RuleImage]:
+    """
+    所有任务 assets.py 里的 RuleImage, 同一个对象只取一次
+    """
+    rules: dict[int, RuleImage] = {}
+    for file in sorted(Path(module_folder).rglob('assets.py')):
+        module = importlib.import_module('.'.join(file.with_suffix('').parts))
+        for name in dir(module):
+            cls = getattr(module, name)
+            if not isinstance(cls, type) or not name.endswith('Assets'):
+                continue
+            for value in vars(cls).values():
+                if isinstance(value, RuleImage) and value.image is not None:
+                    rules[id(value)] = value
+    return list(rules.values())
+
+def timed(func: Callable, *args) -> tuple:
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def same_result(expected: tuple, actual: tuple, threshold: float = THRESHOLD,
+                tolerance: float = LOCATION_TOLERANCE) -> bool:
+    """
+    匹配结论一样, 都匹配上时位置也要一样
+    :param tolerance: 位置允许的误差
+    """
+    expected_found = expected[1] is not None and expected[0] >= threshold
+    actual_found = actual[1] is not None and actual[0] >= threshold
+    if expected_found != actual_found:
+        return False
+    if not expected_found:
+        return True
+    return all(abs(a - b) <= tolerance for a, b in zip(expected[1], actual[1]))
+
+def report(name: str, baseline: float, candidate: float, total: int, mismatches: list) -> None:
+    speedup = baseline / candidate if candidate > 0 else 0.
+    logger.info(f"[Benchmark] {name}: {total} matches, baseline {baseline * 1000:.1f}ms, "
+                f"candidate {candidate * 1000:.1f}ms, speedup {speedup:.2f}x, "
+                f"mismatches {len(mismatches)}")
+    for mismatch in mismatches:
+        logger.warning(f"[Benchmark] {name} mismatch: {mismatch}")
+
+# 分块匹配按搜索区域的像素数分组统计, 找出开始变快的分界点
+TILE_BUCKETS = [25_000, 50_000, 100_000, 200_000, 400_000, 800_000]
+
+@benchmark('tiled')
+def bench_tiled(frames: list, rules: list[RuleImage]) -> None:
+    """
+    大区域整块匹配和分块并行匹配对比, 按区域大小分组输出加速比
+    加速比超过1的最小分组就是 tiling.TILE_MIN_PIXELS 合适的值
+    """
+    def score(image, target) -> tuple:
+        result = cv2.matchTemplate(image, target, cv2.TM_CCORR_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return max_val, max_loc
+
+    buckets = {bucket: [0., 0., 0, []] for bucket in TILE_BUCKETS}
+    for frame_name, frame in frames:
+        for rule in rules:
+            image = rule.crop(frame)
+            target = rule.image
+            pixels = image.shape[0] * image.shape[1]
+            if pixels < TILE_BUCKETS[0] or image.shape[0] < target.shape[0] or image.shape[1] < target.shape[1]:
+                continue
+            bucket = max(b for b in TILE_BUCKETS if b <= pixels)
+            expected, cost = timed(score, image, target)
+            buckets[bucket][0] += cost
+            count = max(2, tiling.tile_count(image.shape))
+            actual, cost = timed(tiling.match_tiled, image, target, count)
+            buckets[bucket][1] += cost
+            buckets[bucket][2] += 1
+            if not same_result(expected, actual):
+                buckets[bucket][3].append((frame_name, rule.name, expected, actual))
+
+    logger.info(f"[Benchmark] tiled: {match_pool.MAX_WORKERS} workers")
+    crossover = None
+    for bucket in TILE_BUCKETS:
+        baseline, candidate, total, mismatches = buckets[bucket]
+        if not total:
+            continue
+        report(f'tiled-{bucket}+', baseline, candidate, total, mismatches)
+        # 这一组和更大的组都变快了才算分界点
+        if candidate < baseline:
+            crossover = bucket if crossover is None else crossover
+        else:
+            crossover = None
+    if match_pool.MAX_WORKERS <= 1:
+        logger.warning("[Benchmark] tiled: single core host, tiled matching is never used")
+    elif crossover is None:
+        logger.warning("[Benchmark] tiled: no speedup on this host, keep matching single-threaded")
+    else:
+        logger.info(f"[Benchmark] tiled: faster from {crossover} pixels, "
+                    f"TILE_MIN_PIXELS is {tiling.TILE_MIN_PIXELS}")
+
+@benchmark('engine')
+def bench_engine(frames: list, rules: list[RuleImage]) -> None:
+    """
+    opencv 逐个匹配和 fft 批量匹配对比
+    batch: 同一个区域有多个图片 (页面检查, 战斗状态检查), single: 区域里只有一个图片
+    """
+    groups: dict[tuple, list[RuleImage]] = {}
+    for rule in rules:
+        groups.setdefault(tuple(int(v) for v in rule.area), []).append(rule)
+
+    baseline_engine, candidate_engine = get_engine('opencv'), get_engine('fft')
+    for name, batched in (('batch', True), ('single', False)):
+        selected = [(area, group) for area, group in groups.items() if (len(group) > 1) == batched]
+        baseline = candidate = 0.
+        total = 0
+        mismatches = []
+        for frame_name, frame in frames:
+            for area, group in selected:
+                image = group[0].crop(frame, area)
+                templates = [rule.image for rule in group]
+                keys = [rule.file for rule in group]
+                expected, cost = timed(baseline_engine.match_many, image, templates, keys)
+                baseline += cost
+                actual, cost = timed(candidate_engine.match_many, image, templates, keys)
+                candidate += cost
+                total += len(group)
+                for rule, e, a in zip(group, expected, actual):
+                    if not same_result(e, a):
+                        mismatches.append((frame_name, rule.name, e, a))
+        report(f'engine-{name}', baseline, candidate, total, mismatches)
+
+# 低分辨率模拟器的截图大小, 1280x720 的截图缩小之后模拟
+RESOLUTIONS = [(960, 540), (640, 360)]
+
+@benchmark('resolution')
+def bench_resolution(frames: list, rules: list[RuleImage]) -> None:
+    """
+    缩小的截图上用缩放之后的资源匹配, 和 1280x720 的结果对比
+    位置换算回 1280x720 再比较, 允许的误差按比例放大
+    同时输出匹配到的资源匹配度平均降低了多少, 用来检查阈值是否还合适
+    """
+    expected = {}
+    baseline = 0.
+    for frame_name, frame in frames:
+        for rule in rules:
+            expected[frame_name, id(rule)], cost = timed(rule.match_score, frame)
+            baseline += cost
+
+    try:
+        for width, height in RESOLUTIONS:
+            resolution.set_size(width, height)
+            fx, fy = resolution.factor()
+            tolerance = LOCATION_TOLERANCE / min(fx, fy)
+            candidate = 0.
+            drops = []
+            mismatches = []
+            for frame_name, frame in frames:
+                small = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+                for rule in rules:
+                    (score, loc), cost = timed(rule.match_score, small)
+                    candidate += cost
+                    actual = (score, None if loc is None else (loc[0] / fx, loc[1] / fy))
+                    e = expected[frame_name, id(rule)]
+                    if e[1] is not None and e[0] >= THRESHOLD:
+                        drops.append(e[0] - score)
+                    if not same_result(e, actual, tolerance=tolerance):
+                        mismatches.append((frame_name, rule.name, e, actual))
+            report(f'resolution-{width}x{height}', baseline, candidate,
+                   len(frames) * len(rules), mismatches)
+            if drops:
+                logger.info(f"[Benchmark] resolution-{width}x{height}: score drop of matched assets "
+                            f"mean {np.mean(drops):.4f}, max {np.max(drops):.4f}")
+    finally:
+        resolution.set_size(*resolution.DESIGN_SIZE)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        logger.error(f"Missing benchmark name, choose from: {', '.join(BENCHMARKS)}")
+        logger.warning("Format: py -m module.image_processing.benchmark [name] [frames_folder]")
+    else:
+        folder = sys.argv[2] if len(sys.argv) > 2 else FRAMES_FOLDER
+        frames = load_frames(folder)
+        if not frames:
+            logger.error(f"No frames found in {folder}")
+        else:
+            BENCHMARKS[sys.argv[1]](frames, load_rules())
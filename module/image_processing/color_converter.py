@@ -0,0 +1,104 @@
+"""
+找出可以换成颜色规则的图片资源
+模板里大部分像素都接近同一个颜色, 并且同一个 json 里重叠位置的其他图片不是这个颜色时,
+用 RuleColor 检查就够了, 输出可以直接放进 res/color.json 的内容
+只是建议, 换之前要在真实的截图上确认没有别的地方是这个颜色
+Format: py -m module.image_processing.color_converter [task_folder]
+"""
+import json
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from module.base.logger import logger
+
+MODULE_FOLDER = 'tasks'
+# 和 RuleColor 的默认值一样
+TOLERANCE = 30
+RATIO = 0.6
+# 模板里至少有这个比例的像素在颜色范围内
+MIN_COVERAGE = 0.8
+
+def parse(value: str) -> tuple:
+    return tuple(int(v) for v in value.split(','))
+
+def overlap(a: tuple, b: tuple) -> bool:
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+def coverage(image: np.ndarray, bgr: np.ndarray, tolerance: int = TOLERANCE) -> float:
+    """
+    图片里颜色在范围内的像素比例
+    """
+    lower = np.clip(bgr.astype(np.int32) - tolerance, 0, 255).astype(np.uint8)
+    upper = np.clip(bgr.astype(np.int32) + tolerance, 0, 255).astype(np.uint8)
+    mask = cv2.inRange(image, lower, upper)
+    return cv2.countNonZero(mask) / (image.shape[0] * image.shape[1])
+
+def suggest(file: Path) -> list[dict]:
+    """
+    一个 image json 里可以转换的资源
+    :return: color json 的条目
+    """
+    with open(file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, list) or not data or data[0].get('type') != 'image':
+        return []
+
+    templates = []
+    for item in data:
+        image = cv2.imread(item['file']) if item.get('file') else None
+        if image is not None:
+            templates.append((item, image))
+
+    suggestions = []
+    for item, image in templates:
+        # 中位数不受边缘的抗锯齿像素影响
+        bgr = np.median(image.reshape(-1, image.shape[-1])[:, :3], axis=0).astype(np.int32)
+        covered = coverage(image, bgr)
+        if covered < MIN_COVERAGE:
+            continue
+
+        # 同一位置的另一种状态 (开/关) 如果也是这个颜色, 颜色规则就分不开
+        roi = parse(item['roi'])
+        conflicts = [other['name'] for other, other_image in templates
+                     if other is not item and overlap(roi, parse(other['roi']))
+                     and coverage(other_image, bgr) >= RATIO]
+        if conflicts:
+            logger.warning(f"[Color] {item['name']} conflicts with {', '.join(conflicts)}")
+            continue
+
+        logger.info(f"[Color] {item['name']} qualifies, coverage {covered:.2f}")
+        suggestions.append({
+            'name': item['name'],
+            'type': 'color',
+            'roi': item['roi'],
+            'area': item['area'],
+            'color': ', '.join(str(int(v)) for v in bgr[::-1]),
+            'tolerance': TOLERANCE,
+            'ratio': RATIO,
+            'description': item.get('description', 'description'),
+        })
+    return suggestions
+
+def convert(folder: str = MODULE_FOLDER) -> dict[str, list]:
+    """
+    检查文件夹下所有的 image json
+    :return: {json 文件: [color json 的条目]}
+    """
+    result = {}
+    for file in sorted(Path(folder).rglob('*.json')):
+        if 'temp' in str(file) or file.parent.name != 'res':
+            continue
+        suggestions = suggest(file)
+        if suggestions:
+            result[file.as_posix()] = suggestions
+    return result
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else MODULE_FOLDER
+    for file, suggestions in convert(folder).items():
+        logger.info(f"[Color] {file}: {len(suggestions)} assets can use color rules")
+        print(json.dumps(suggestions, ensure_ascii=False, indent=2))
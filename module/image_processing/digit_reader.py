@@ -0,0 +1,344 @@
+"""
+数字读取
+票数, 等级这些数字是固定的字体, 不需要完整的 OCR 模型
+二值化之后按连通域切出每个字, 和字形模板比较, 支持 0-9, '/' 和 ','
+置信度不够时返回空, RuleOcr 会退回到 ONNX 识别
+资源 json 里设置 "digits": true 的 RuleOcr 才会使用
+仓库里还没有字形模板 (GLYPH_FOLDER), 所以资源里都没有设置 digits, 数字资源都使用 ONNX
+
+字形模板从保存下来的截图里提取:
+1. py -m module.image_processing.digit_reader crop [frames_folder]
+   截取所有数字资源的区域, 用 ONNX 识别的结果生成 labels.json, 需要人工检查
+2. py -m module.image_processing.digit_reader extract
+   按 labels.json 切出每个字, 保存到 GLYPH_FOLDER
+3. py -m module.image_processing.digit_reader compare
+   和 ONNX 识别对比准确率和耗时
+4. 提交 GLYPH_FOLDER 之后, 在 DIGIT_ASSETS 对应的 ocr.json 里设置 "digits": true
+"""
+import importlib
+import json
+import sys
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from module.base.logger import logger
+
+GLYPH_FOLDER = './tasks/glyphs'
+CROPS_FOLDER = './frames/digits'
+LABEL_FILE = 'labels.json'
+# 字形统一缩放到这个边长再比较
+GLYPH_SIZE = 20
+# 文件名里不能用的字符换成名字
+CHAR_NAMES = {'/': 'slash', ',': 'comma'}
+CHARS = '0123456789/,'
+# 每个字都达到这个相似度才使用结果
+MIN_CONFIDENCE = 0.8
+# 最像的字要比第二像的另一个字高出这么多, 0/8, 1/7 这种分不清的字退回 ONNX
+MIN_MARGIN = 0.05
+# 小于这个像素数的连通域是噪点
+MIN_AREA = 3
+# 每个字最多保存几个模板, 和已有模板相似度超过 DUPLICATE 时不保存
+MAX_PER_CHAR = 5
+DUPLICATE = 0.97
+# 固定字体的数字资源, 生成字形模板用
+DIGIT_ASSETS = ('RAID_TICKET', 'GUILD_RAID_TICKET', 'GR_TICKET_COUNT',
+                'EXP_VIEW_TICKET_COUNT', 'BACKUP_COUNT')
+
+def binarize(image: np.ndarray) -> np.ndarray:
+    """
+    Otsu 二值化, 文字为255
+    文字的像素比背景少, 多的一边是背景
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if cv2.countNonZero(binary) > binary.size / 2:
+        binary = cv2.bitwise_not(binary)
+    return binary
+
+def segment(image: np.ndarray) -> list[np.ndarray]:
+    """
+    切出每个字, 从左到右
+    :return: 归一化之后的字形, GLYPH_SIZE x GLYPH_SIZE 的 float32
+    """
+    if image is None or image.size == 0:
+        return []
+    binary = binarize(image)
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    components = sorted((i for i in range(1, count) if stats[i, cv2.CC_STAT_AREA] >= MIN_AREA),
+                        key=lambda i: stats[i, cv2.CC_STAT_LEFT])
+
+    # 横向重叠超过一半的连通域是同一个字断开的笔画
+    glyphs: list[list] = []  # [[x1, y1, x2, y2, [连通域]]]
+    for i in components:
+        x, y, w, h = stats[i, :4]
+        if glyphs:
+            last = glyphs[-1]
+            overlap = min(last[2], x + w) - max(last[0], x)
+            if overlap > min(last[2] - last[0], w) / 2:
+                last[0], last[1] = min(last[0], x), min(last[1], y)
+                last[2], last[3] = max(last[2], x + w), max(last[3], y + h)
+                last[4].append(i)
+                continue
+        glyphs.append([x, y, x + w, y + h, [i]])
+    if not glyphs:
+        return []
+
+    # 数字的高度一样, 用中位数作为行高, ',' 这种矮的字不影响
+    line_top = float(np.median([g[1] for g in glyphs]))
+    line_height = max(1., float(np.median([g[3] - g[1] for g in glyphs])))
+    return [normalize(np.isin(labels[g[1]:g[3], g[0]:g[2]], g[4]), g, line_top, line_height) for g in glyphs]
+
+def normalize(mask: np.ndarray, glyph: list, line_top: float, line_height: float) -> np.ndarray:
+    """
+    按行高把字放到固定大小的画布上, 保留字在行里的高低和大小
+    :param mask: 字的外框里属于这个字的像素
+    画布高 1.5 倍行高 (上下各留 0.25), 宽 1.5 倍行高, 字水平居中
+    """
+    x1, y1, x2, y2 = glyph[:4]
+    size = int(np.ceil(line_height * 1.5))
+    canvas = np.zeros((size, size), dtype=np.uint8)
+    top = int(round(y1 - line_top + line_height * 0.25))
+    left = (size - (x2 - x1)) // 2
+    patch = mask.astype(np.uint8) * 255
+    # 超出画布的部分丢掉
+    py1, px1 = max(0, -top), max(0, -left)
+    cy1, cx1 = max(0, top), max(0, left)
+    h = min(patch.shape[0] - py1, size - cy1)
+    w = min(patch.shape[1] - px1, size - cx1)
+    if h > 0 and w > 0:
+        canvas[cy1: cy1 + h, cx1: cx1 + w] = patch[py1: py1 + h, px1: px1 + w]
+    return cv2.resize(canvas, (GLYPH_SIZE, GLYPH_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+def vector(glyph: np.ndarray) -> np.ndarray:
+    """
+    减去均值再除以长度, 两个向量的点积就是相关系数, 和 TM_CCOEFF_NORMED 一样
+    """
+    v = glyph.ravel().astype(np.float32)
+    v = v - v.mean()
+    norm = np.linalg.norm(v)
+    return v / norm if norm > 0 else v
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    两个归一化字形的相关系数
+    """
+    return float(vector(a) @ vector(b))
+
+class DigitReader:
+
+    def __init__(self, folder: str = GLYPH_FOLDER) -> None:
+        """
+        读取字形模板, 文件名是 字_编号.png, '/' 和 ',' 用 CHAR_NAMES 里的名字
+        """
+        self.folder = Path(folder)
+        self.templates: list[tuple[str, np.ndarray]] = []
+        names = {name: char for char, name in CHAR_NAMES.items()}
+        for file in sorted(self.folder.glob('*.png')):
+            char = file.stem.rsplit('_', 1)[0]
+            char = names.get(char, char)
+            image = cv2.imread(str(file), cv2.IMREAD_GRAYSCALE)
+            if char not in CHARS or image is None or image.shape != (GLYPH_SIZE, GLYPH_SIZE):
+                logger.warning(f"[Digits] Skip glyph template {file.name}")
+                continue
+            self.templates.append((char, image.astype(np.float32)))
+        self._matrix: Optional[np.ndarray] = None  # 所有模板的 vector, 一次矩阵乘法比较所有模板
+        self._chars: Optional[np.ndarray] = None  # 每一行模板对应的字
+        if not self.templates:
+            logger.info(f"[Digits] No glyph templates in {self.folder}, digit assets use ONNX OCR")
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.templates)
+
+    def classify(self, glyph: np.ndarray) -> tuple[str, float, float]:
+        """
+        :return: (最像的字, 相似度, 比最像的另一个字高出的相似度)
+        """
+        if self._matrix is None:
+            self._matrix = np.stack([vector(template) for _, template in self.templates])
+            self._chars = np.array([char for char, _ in self.templates])
+        scores = self._matrix @ vector(glyph)
+        index = int(np.argmax(scores))
+        char, score = self.templates[index][0], float(scores[index])
+        others = scores[self._chars != char]
+        # 只有一种字的模板时没有可以比较的, 差距按相似度算
+        margin = score - float(others.max()) if others.size else score
+        return char, score, margin
+
+    def read(self, image: np.ndarray) -> tuple[str, float]:
+        """
+        :param image: 截取之后的数字区域
+        :return: (文字, 置信度), 置信度是所有字里最低的相似度, 有一个字和另一个字差距不到 MIN_MARGIN 时为0
+            没有模板或者没有字时为 ("", 0.)
+        """
+        if not self.ready:
+            return "", 0.
+        glyphs = segment(image)
+        if not glyphs:
+            return "", 0.
+        chars = [self.classify(glyph) for glyph in glyphs]
+        text = ''.join(char for char, _, _ in chars)
+        if any(margin < MIN_MARGIN for _, _, margin in chars):
+            return text, 0.
+        return text, max(0., min(score for _, score, _ in chars))
+
+    def save(self, char: str, glyph: np.ndarray) -> bool:
+        """
+        保存一个字形模板, 和已有模板太像或者数量已满时不保存
+        """
+        same = [template for c, template in self.templates if c == char]
+        if len(same) >= MAX_PER_CHAR or any(similarity(glyph, t) >= DUPLICATE for t in same):
+            return False
+        self.folder.mkdir(parents=True, exist_ok=True)
+        name = CHAR_NAMES.get(char, char)
+        index = 0
+        while (self.folder / f'{name}_{index}.png').exists():
+            index += 1
+        cv2.imwrite(str(self.folder / f'{name}_{index}.png'), glyph.astype(np.uint8))
+        self.templates.append((char, glyph))
+        self._matrix = None
+        return True
+
+_reader: Optional[DigitReader] = None
+_lock = Lock()
+
+def digit_reader() -> DigitReader:
+    """
+    所有 RuleOcr 共用的数字读取, 第一次使用时读取模板
+    """
+    global _reader
+    if _reader is None:
+        with _lock:
+            if _reader is None:
+                _reader = DigitReader()
+    return _reader
+
+def digit_rules(module_folder: str = 'tasks') -> list:
+    """
+    DIGIT_ASSETS 里和设置了 digits 的 RuleOcr
+    """
+    from module.image_processing.rule_ocr import RuleOcr
+    rules = {}
+    for file in sorted(Path(module_folder).rglob('assets.py')):
+        module = importlib.import_module('.'.join(file.with_suffix('').parts))
+        for name in dir(module):
+            cls = getattr(module, name)
+            if not isinstance(cls, type) or not name.endswith('Assets'):
+                continue
+            for value in vars(cls).values():
+                if isinstance(value, RuleOcr) and (value.digits or value.name in DIGIT_ASSETS):
+                    rules[id(value)] = value
+    return list(rules.values())
+
+def load_labels(folder: str) -> dict[str, str]:
+    file = Path(folder) / LABEL_FILE
+    if not file.is_file():
+        logger.error(f"[Digits] Missing {file}")
+        return {}
+    with open(file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def crop(frames_folder: str = './frames', folder: str = CROPS_FOLDER) -> None:
+    """
+    截取所有数字资源的区域, labels.json 里先填 ONNX 的识别结果
+    """
+    from module.image_processing import ocr_engine
+    Path(folder).mkdir(parents=True, exist_ok=True)
+    labels = {}
+    rules = digit_rules()
+    for frame_file in sorted(Path(frames_folder).glob('*.png')):
+        frame = cv2.imread(str(frame_file))
+        if frame is None:
+            continue
+        for rule in rules:
+            image = rule.crop(frame)
+            if image.size == 0:
+                continue
+            name = f'{rule.name}_{frame_file.stem}.png'
+            cv2.imwrite(str(Path(folder) / name), image)
+            result = ocr_engine.engine().ocr_single_line(image)
+            labels[name] = result[0] if result else ''
+    with open(Path(folder) / LABEL_FILE, 'w', encoding='utf-8', newline='\n') as f:
+        json.dump(labels, f, ensure_ascii=False, indent=2)
+    logger.info(f"[Digits] Saved {len(labels)} crops to {folder}, check {LABEL_FILE} before extracting")
+
+def extract(folder: str = CROPS_FOLDER) -> None:
+    """
+    按标注切出每个字, 字数和标注不一样的图片跳过
+    """
+    reader = DigitReader()
+    saved = skipped = 0
+    for name, label in load_labels(folder).items():
+        image = cv2.imread(str(Path(folder) / name))
+        text = label.replace(' ', '')
+        if image is None or not text or any(char not in CHARS for char in text):
+            skipped += 1
+            continue
+        glyphs = segment(image)
+        if len(glyphs) != len(text):
+            logger.warning(f"[Digits] {name}: {len(glyphs)} glyphs for label '{text}'")
+            skipped += 1
+            continue
+        saved += sum(reader.save(char, glyph) for char, glyph in zip(text, glyphs))
+    logger.info(f"[Digits] Saved {saved} glyph templates, skipped {skipped} crops, "
+                f"{len(reader.templates)} templates in {reader.folder}")
+
+def compare(folder: str = CROPS_FOLDER) -> None:
+    """
+    字形读取和 ONNX 识别的准确率和耗时
+    字形读取的置信度不够时按实际运行一样退回 ONNX
+    """
+    from module.image_processing import ocr_engine
+    reader = DigitReader()
+    if not reader.ready:
+        logger.error(f"[Digits] No glyph templates in {reader.folder}")
+        return
+    model = ocr_engine.engine()
+    total = glyph_used = glyph_correct = onnx_correct = combined_correct = 0
+    glyph_time = onnx_time = 0.
+    for name, label in load_labels(folder).items():
+        image = cv2.imread(str(Path(folder) / name))
+        if image is None:
+            continue
+        label = label.replace(' ', '')
+        start = time.perf_counter()
+        text, confidence = reader.read(image)
+        glyph_time += time.perf_counter() - start
+        start = time.perf_counter()
+        result = model.ocr_single_line(image)
+        onnx_time += time.perf_counter() - start
+        onnx_text = result[0].replace(' ', '') if result else ''
+
+        total += 1
+        onnx_correct += onnx_text == label
+        if confidence >= MIN_CONFIDENCE:
+            glyph_used += 1
+            glyph_correct += text == label
+            combined_correct += text == label
+            if text != label:
+                logger.warning(f"[Digits] {name}: read '{text}' ({confidence:.2f}), label '{label}'")
+        else:
+            combined_correct += onnx_text == label
+    if not total:
+        logger.error(f"[Digits] No labeled crops in {folder}")
+        return
+    logger.info(f"[Digits] {total} crops, glyph reader used on {glyph_used} "
+                f"({glyph_used / total:.1%}), correct {glyph_correct}/{glyph_used}")
+    logger.info(f"[Digits] accuracy: onnx {onnx_correct / total:.1%}, "
+                f"glyph with onnx fallback {combined_correct / total:.1%}")
+    logger.info(f"[Digits] mean latency: glyph {glyph_time / total * 1000:.2f}ms, "
+                f"onnx {onnx_time / total * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    commands = {'crop': crop, 'extract': extract, 'compare': compare}
+    if len(sys.argv) < 2 or sys.argv[1] not in commands:
+        logger.error(f"Missing command, choose from: {', '.join(commands)}")
+        logger.warning("Format: py -m module.image_processing.digit_reader [command] [folder]")
+    else:
+        commands[sys.argv[1]](*sys.argv[2:3])
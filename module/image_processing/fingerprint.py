@@ -0,0 +1,65 @@
+import cv2
+import numpy as np
+
+# 缩略图大小, 只用来判断画面有没有变化
+THUMBNAIL_SIZE = (32, 18)
+
+def thumbnail(image: np.ndarray) -> np.ndarray:
+    """
+    把图片缩小成灰度缩略图, 作为画面的指纹
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(image, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+
+def changed(prev: np.ndarray, curr: np.ndarray, tolerance: float = 2.0) -> bool:
+    """
+    两个指纹的平均差异超过 tolerance 就认为画面变了
+    """
+    if prev.shape != curr.shape:
+        return True
+    return float(cv2.absdiff(prev, curr).mean()) > tolerance
+
+# 区域指纹的块大小, 整张图按块求均值
+BLOCK_SIZE = 8
+
+def signature(image: np.ndarray) -> np.ndarray:
+    """
+    整帧的块均值指纹, 每 BLOCK_SIZE x BLOCK_SIZE 的灰度均值作为一个值
+    1280x720 的截图得到 160x90 的指纹
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    h, w = image.shape[:2]
+    size = (max(1, w // BLOCK_SIZE), max(1, h // BLOCK_SIZE))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+def region(sig: np.ndarray, area) -> np.ndarray:
+    """
+    从整帧的指纹里取出 area 覆盖的块
+    :param area: (x, y, w, h) 截图坐标
+    """
+    x, y, w, h = [int(v) for v in area]
+    x1, y1 = max(0, x // BLOCK_SIZE), max(0, y // BLOCK_SIZE)
+    x2 = max(x1 + 1, -(-(x + w) // BLOCK_SIZE))
+    y2 = max(y1 + 1, -(-(y + h) // BLOCK_SIZE))
+    return sig[y1:y2, x1:x2]
+
+def region_changed(prev: np.ndarray, curr: np.ndarray, tolerance: int = 2) -> bool:
+    """
+    区域内任意一块的变化超过 tolerance 就认为变了
+    用最大值而不是均值, 大区域里出现一个小图标也能检测到
+    """
+    if prev.shape != curr.shape:
+        return True
+    if prev.size == 0:
+        return False
+    return int(cv2.absdiff(prev, curr).max()) > tolerance
+
+def motion(prev: np.ndarray, curr: np.ndarray) -> float:
+    """
+    两帧指纹的平均差异, 表示画面运动的程度
+    """
+    if prev.shape != curr.shape:
+        return 255.
+    return float(cv2.absdiff(prev, curr).mean())
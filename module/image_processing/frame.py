@@ -0,0 +1,117 @@
+"""
+一帧截图和它的派生图片
+灰度图, 缩小图, HSV, 积分图第一次使用时计算, 同一帧里只计算一次, 所有资源共用
+派生图片占用的内存有上限, 新的一帧到来时释放
+"""
+from collections import OrderedDict
+from threading import RLock
+from typing import Callable, Hashable, Optional, Union
+
+import cv2
+import numpy as np
+
+# 派生图片最多占用的内存, 1280x720 的灰度图, 半尺寸, 四分之一尺寸, HSV 和积分图加起来大约 7.6MB
+MAX_VIEW_BYTES = 8 * 1024 * 1024
+
+class Frame:
+
+    def __init__(self, image: np.ndarray, frame_id: int = 0, max_bytes: int = MAX_VIEW_BYTES) -> None:
+        """
+        :param image: BGR 截图
+        :param frame_id: 截图的帧编号, 同 Device.frame_id
+        :param max_bytes: 派生图片的内存上限, 超出时丢弃最久没有使用的
+        """
+        self.image = image
+        self.frame_id = frame_id
+        self.max_bytes = max_bytes
+        self._views: OrderedDict[Hashable, np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._lock = RLock()  # 缩小图和积分图生成时会用到灰度图, 需要可重入
+
+    @property
+    def shape(self) -> tuple:
+        return self.image.shape
+
+    @property
+    def nbytes(self) -> int:
+        """派生图片占用的内存"""
+        return self._bytes
+
+    def view(self, key: Hashable, build: Callable[[], np.ndarray]) -> np.ndarray:
+        """
+        派生图片, 第一次使用时用 build 生成
+        多个线程同时匹配时只生成一次
+        """
+        with self._lock:
+            image = self._views.get(key)
+            if image is not None:
+                self._views.move_to_end(key)
+                return image
+
+            image = build()
+            if image.nbytes > self.max_bytes:
+                return image
+            self._views[key] = image
+            self._bytes += image.nbytes
+            while self._bytes > self.max_bytes:
+                _, dropped = self._views.popitem(last=False)
+                self._bytes -= dropped.nbytes
+            return image
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self.view('gray', lambda: cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY))
+
+    def scaled(self, level: int) -> np.ndarray:
+        """
+        缩小 2 ** level 倍的灰度图, 1 是半尺寸, 2 是四分之一尺寸
+        每一级都从上一级缩小
+        """
+        if level <= 0:
+            return self.gray
+        return self.view(('scaled', level), lambda: cv2.resize(
+            self.scaled(level - 1), None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA))
+
+    @property
+    def half(self) -> np.ndarray:
+        return self.scaled(1)
+
+    @property
+    def quarter(self) -> np.ndarray:
+        return self.scaled(2)
+
+    @property
+    def hsv(self) -> np.ndarray:
+        return self.view('hsv', lambda: cv2.cvtColor(self.image, cv2.COLOR_BGR2HSV))
+
+    @property
+    def integral(self) -> np.ndarray:
+        """
+        灰度图的积分图, 大小是 (h + 1, w + 1), 任意矩形的像素和只需要四次查表
+        """
+        return self.view('integral', lambda: cv2.integral(self.gray))
+
+    def area_sum(self, area) -> int:
+        """
+        灰度图 area 区域的像素和
+        """
+        x, y, w, h = [int(v) for v in area]
+        s = self.integral
+        return int(s[y + h, x + w] - s[y, x + w] - s[y + h, x] + s[y, x])
+
+    def release(self) -> None:
+        """
+        释放所有的派生图片
+        """
+        with self._lock:
+            self._views.clear()
+            self._bytes = 0
+
+def unwrap(screenshot: Union[np.ndarray, Frame, None]) -> tuple[Optional[np.ndarray], Optional[Frame]]:
+    """
+    识别函数可以传入截图或者 Frame
+    :return: (截图, Frame), 传入的是截图时 Frame 为None
+    """
+    if isinstance(screenshot, Frame):
+        return screenshot.image, screenshot
+    return screenshot, None
@@ -0,0 +1,33 @@
+"""
+一个图片在区域里多次出现时的识别 (RuleImage.match_all)
+用非极大值抑制从 matchTemplate 的结果里取出所有的匹配位置
+"""
+
+import cv2
+import numpy as np
+
+def non_max_suppression(result: np.ndarray, threshold: float, size: tuple) -> list[tuple[float, tuple]]:
+    """
+    从 matchTemplate 的结果里取出所有达到阈值的峰值, 两个峰值相距小于模板大小时只保留高的
+    :param size: (w, h) 模板大小
+    :return: [(匹配度, (x, y))], 按匹配度从高到低
+    """
+    w, h = size
+    # 先只保留模板大小范围内的局部最大值, 候选点会少很多
+    kernel = np.ones((max(1, h // 2) * 2 + 1, max(1, w // 2) * 2 + 1), np.uint8)
+    peaks = (result >= threshold) & (result >= cv2.dilate(result, kernel))
+    ys, xs = np.nonzero(peaks)
+    if not len(xs):
+        return []
+
+    scores = result[ys, xs]
+    order = np.argsort(-scores, kind='stable')
+    xs, ys, scores = xs[order], ys[order], scores[order]
+    suppressed = np.zeros(len(xs), dtype=bool)
+    keep = []
+    for i in range(len(xs)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= (np.abs(xs - xs[i]) < w) & (np.abs(ys - ys[i]) < h)
+    return [(float(scores[i]), (int(xs[i]), int(ys[i]))) for i in keep]
@@ -7,6 +7,7 @@ from cv2.typing import MatLike
 import numpy as np
 from typing import Optional, Tuple
 from module.base.logger import logger
+from module.image_processing import resolution
 
 class ImageProcessor:
     screenshot: Optional[MatLike] = None
@@ -172,8 +173,9 @@ class ImageProcessor:
         x = x if x >= 0 else 0
         y = y if y >= 0 else 0
 
-        x = x if x < 1280 else 1279
-        y = y if y < 720 else 719
+        width, height = resolution.size()
+        x = x if x < width else width - 1
+        y = y if y < height else height - 1
 
         return (x, y)
 
@@ -0,0 +1,87 @@
+from typing import Optional
+
+import numpy as np
+
+from module.image_processing import fingerprint
+
+class MatchCache:
+    """
+    模板匹配结果缓存
+    key 是 (frame_id, 资源名, area), value 是 (匹配度, 匹配位置)
+    匹配度和阈值无关, 所以不同阈值的检查也可以共用一次匹配的结果
+
+    - 同一帧内: 新的一帧到来时清空
+    - 跨帧: 记录上次匹配时 area 区域的指纹, 新的一帧里这块区域没有变化就直接复用上次的结果
+    """
+
+    def __init__(self) -> None:
+        self.frame_id = 0
+        self.signature: Optional[np.ndarray] = None
+        self._results: dict[tuple, tuple] = {}
+        self._static: dict[tuple, tuple] = {}
+        self.hits = 0
+        self.static_hits = 0
+        self.misses = 0
+
+    def reset(self, frame_id: int, signature: Optional[np.ndarray] = None) -> None:
+        """
+        新的一帧, 丢弃之前的结果
+        :param signature: 新一帧的块均值指纹, None 则不做跨帧复用
+        """
+        self.frame_id = frame_id
+        self.signature = signature
+        self._results.clear()
+        if signature is None:
+            self._static.clear()
+
+    def key(self, name: str, area) -> tuple:
+        return self.frame_id, name, tuple(area)
+
+    def get(self, key: tuple) -> Optional[tuple]:
+        result = self._results.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        static = self._static.get(key[1:])
+        if static is not None and self.signature is not None:
+            prev, result = static
+            if not fingerprint.region_changed(prev, fingerprint.region(self.signature, key[2])):
+                self._results[key] = result
+                self.static_hits += 1
+                return result
+
+        self.misses += 1
+        return None
+
+    def set(self, key: tuple, result: tuple) -> None:
+        self._results[key] = result
+        x, y, w, h = key[2]
+        if self.signature is not None and w > 0 and h > 0:
+            region = fingerprint.region(self.signature, key[2]).copy()
+            self._static[key[1:]] = (region, result)
+
+    def changed(self, area, since: np.ndarray) -> bool:
+        """
+        当前帧 area 区域和 since 相比是否有变化
+        :param since: 之前用 region 取出的指纹
+        """
+        if self.signature is None:
+            return True
+        return fingerprint.region_changed(since, fingerprint.region(self.signature, area))
+
+    def region(self, area) -> Optional[np.ndarray]:
+        """当前帧 area 区域的指纹"""
+        if self.signature is None:
+            return None
+        return fingerprint.region(self.signature, area).copy()
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.static_hits + self.misses
+        return (self.hits + self.static_hits) / total if total else 0.
+
+    @property
+    def stats(self) -> str:
+        return f"hits: {self.hits}, static hits: {self.static_hits}, misses: {self.misses}, " \
+            f"hit ratio: {self.hit_ratio:.1%}"
@@ -0,0 +1,144 @@
+"""
+模板匹配的后端
+- opencv: cv2.matchTemplate, 每个模板单独匹配, 很大的区域分块并行
+- fft: 同一个区域的多个模板一起匹配, 区域只做一次傅里叶变换, 每个模板和它的频谱相乘
+两个后端的匹配度都是 TM_CCORR_NORMED, 阈值通用
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable, Optional
+
+import cv2
+import numpy as np
+
+from module.image_processing import tiling
+
+class MatchEngine:
+    name = ''
+    # 多个模板一起匹配比逐个匹配更快, Controls.which_appears 会把同一区域的模板放在一起
+    batched = False
+
+    def match(self, image: np.ndarray, template: np.ndarray, key: Optional[Hashable] = None) -> tuple:
+        """
+        :param image: 截取之后的搜索区域
+        :param key: 模板唯一的名字, 同 match_many
+        :return: (匹配度, 相对搜索区域的位置), 模板比区域大时位置为None
+        """
+        return self.match_many(image, [template], [key])[0]
+
+    def match_many(self, image: np.ndarray, templates: list[np.ndarray],
+                   keys: Optional[list[Hashable]] = None) -> list[tuple]:
+        """
+        同一个区域匹配多个模板
+        :param keys: 每个模板唯一的名字 (比如文件路径), 后端可以用来缓存模板的预处理结果
+        :return: 每个模板的 match 结果, 和 templates 的顺序一样
+        """
+        keys = keys or [None] * len(templates)
+        return [self.match(image, template, key) for template, key in zip(templates, keys)]
+
+class OpenCVEngine(MatchEngine):
+    name = 'opencv'
+
+    def match(self, image: np.ndarray, template: np.ndarray, key: Optional[Hashable] = None) -> tuple:
+        if template.shape[0] > image.shape[0] or template.shape[1] > image.shape[1]:
+            return 0., None
+        if tiling.should_tile(image.shape, template.shape):
+            # 很大的区域分块在线程池里并行匹配
+            return tiling.match_tiled(image, template)
+        result = cv2.matchTemplate(image, template, cv2.TM_CCORR_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return max_val, max_loc
+
+# 模板频谱缓存的内存上限, 同一个区域大小的模板频谱可以一直复用
+SPECTRUM_CACHE_BYTES = 32 * 1024 * 1024
+
+class FFTEngine(MatchEngine):
+    name = 'fft'
+    batched = True
+
+    def __init__(self, max_bytes: int = SPECTRUM_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._spectra: OrderedDict[tuple, tuple] = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+
+    @staticmethod
+    def planes(image: np.ndarray) -> np.ndarray:
+        """
+        (通道, h, w) 的浮点图, 每个通道连续存放, 傅里叶变换快很多
+        """
+        h, w = image.shape[:2]
+        return np.ascontiguousarray(image.reshape(h, w, -1).transpose(2, 0, 1), dtype=np.float64)
+
+    def template_spectrum(self, template: np.ndarray, fft_shape: tuple,
+                          key: Optional[Hashable] = None) -> tuple:
+        """
+        模板补零到 fft_shape 之后的频谱共轭和平方和, 有 key 时缓存
+        """
+        cache_key = (key, fft_shape, template.shape)
+        if key is not None:
+            with self._lock:
+                cached = self._spectra.get(cache_key)
+                if cached is not None:
+                    self._spectra.move_to_end(cache_key)
+                    return cached
+
+        planes = self.planes(template)
+        cached = np.conj(np.fft.rfft2(planes, s=fft_shape)), float((planes * planes).sum())
+        if key is not None and cached[0].nbytes <= self.max_bytes:
+            with self._lock:
+                if cache_key not in self._spectra:
+                    self._spectra[cache_key] = cached
+                    self._bytes += cached[0].nbytes
+                while self._bytes > self.max_bytes:
+                    _, dropped = self._spectra.popitem(last=False)
+                    self._bytes -= dropped[0].nbytes
+        return cached
+
+    def match_many(self, image: np.ndarray, templates: list[np.ndarray],
+                   keys: Optional[list[Hashable]] = None) -> list[tuple]:
+        """
+        区域的频谱和窗口能量只计算一次
+        匹配度 = sum(I * T) / sqrt(sum(I * I) * sum(T * T)), 和 TM_CCORR_NORMED 一样所有通道一起求和
+        """
+        h, w = image.shape[:2]
+        if h == 0 or w == 0:
+            return [(0., None) for _ in templates]
+        fft_shape = (cv2.getOptimalDFTSize(h), cv2.getOptimalDFTSize(w))
+        area = self.planes(image)
+        spectrum = np.fft.rfft2(area, s=fft_shape)
+        # 每个窗口里像素平方和用积分图求
+        energy = cv2.integral((area * area).sum(axis=0))
+        keys = keys or [None] * len(templates)
+
+        results = []
+        for template, key in zip(templates, keys):
+            th, tw = template.shape[:2]
+            if th > h or tw > w:
+                results.append((0., None))
+                continue
+            target_spectrum, target_energy = self.template_spectrum(template, fft_shape, key)
+            # 互相关: 区域频谱乘模板频谱的共轭, 通道在频域里直接相加
+            product = spectrum[0] * target_spectrum[0]
+            for channel in range(1, len(spectrum)):
+                product += spectrum[channel] * target_spectrum[channel]
+            corr = np.fft.irfft2(product, s=fft_shape)[: h - th + 1, : w - tw + 1]
+            window = (energy[th:, tw:] - energy[:-th, tw:] - energy[th:, :-tw] + energy[:-th, :-tw])
+            denominator = np.sqrt(np.maximum(window, 0.) * target_energy)
+            score = np.divide(corr, denominator, out=np.zeros_like(corr), where=denominator > 1e-6)
+            index = int(np.argmax(score))
+            y, x = divmod(index, score.shape[1])
+            results.append((min(float(score[y, x]), 1.), (x, y)))
+        return results
+
+ENGINES: dict[str, MatchEngine] = {engine.name: engine for engine in (OpenCVEngine(), FFTEngine())}
+DEFAULT_ENGINE = 'opencv'
+
+def get_engine(name: Optional[str] = None) -> MatchEngine:
+    """
+    :param name: 后端名称, None 时使用默认的 opencv
+    """
+    engine = ENGINES.get(name or DEFAULT_ENGINE)
+    if engine is None:
+        raise ValueError(f"Unknown match engine: {name}, choose from: {', '.join(ENGINES)}")
+    return engine
@@ -0,0 +1,40 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, current_thread
+from typing import Callable, Iterable, Optional
+
+# cv2.matchTemplate 计算时会释放GIL, 多个模板可以用线程池并行匹配
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+THREAD_NAME_PREFIX = 'match'
+
+_pool: Optional[ThreadPoolExecutor] = None
+_lock = Lock()
+
+def match_pool() -> ThreadPoolExecutor:
+    """
+    所有设备共用的匹配线程池, 第一次使用时创建
+    """
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=MAX_WORKERS, thread_name_prefix=THREAD_NAME_PREFIX)
+    return _pool
+
+def in_pool() -> bool:
+    """
+    当前线程是不是匹配线程池里的线程
+    """
+    return current_thread().name.startswith(f'{THREAD_NAME_PREFIX}_')
+
+def parallel_map(func: Callable, items: Iterable) -> list:
+    """
+    在匹配线程池里执行, 只有一个任务时直接在当前线程执行
+    已经在线程池里时也直接执行, 线程都在等子任务的话会卡死
+    """
+    items = list(items)
+    if len(items) <= 1 or MAX_WORKERS <= 1 or in_pool():
+        return [func(item) for item in items]
+    return list(match_pool().map(func, items))
@@ -0,0 +1,73 @@
+"""
+识别结果
+匹配和 OCR 的结果都是不可变的值, 不再写回资源对象上 (RuleImage.roi / RuleOcr.roi)
+资源是类属性, 多个线程或者多个设备共用时只读, 点击时使用结果里的位置
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from module.base.logger import logger
+
+@dataclass(frozen=True, slots=True)
+class MatchResult:
+    name: str
+    score: float
+    loc: Optional[tuple[int, int]]  # 匹配位置左上角, 无法匹配时为None
+    size: tuple[int, int]  # (w, h) 模板大小
+    threshold: float = 0.
+    frame_id: int = 0
+
+    @property
+    def found(self) -> bool:
+        return self.loc is not None and self.score >= self.threshold
+
+    def __bool__(self) -> bool:
+        return self.found
+
+    @property
+    def roi(self) -> tuple[int, int, int, int]:
+        """
+        匹配到的区域, 用于点击
+        """
+        if self.loc is None:
+            return 0, 0, 0, 0
+        return self.loc[0], self.loc[1], self.size[0], self.size[1]
+
+    def coord(self) -> tuple:
+        """
+        获取坐标, 从roi随机获取坐标
+        """
+        x, y, w, h = self.roi
+        x += np.random.randint(0, max(1, w))
+        y += np.random.randint(0, max(1, h))
+        logger.background(f"[Click] {self.name} coord: {x}, {y}")
+        return int(x), int(y)
+
+    def roi_center(self) -> tuple:
+        x, y, w, h = self.roi
+        return int(x + w // 2), int(y + h // 2)
+
+@dataclass(frozen=True, slots=True)
+class OcrResult:
+    name: str
+    text: str
+    roi: tuple[int, int, int, int]  # 识别到的文字的区域, 没有识别到时为 (0, 0, 0, 0)
+    frame_id: int = 0
+
+    @property
+    def found(self) -> bool:
+        return self.roi != (0, 0, 0, 0)
+
+    def __bool__(self) -> bool:
+        return self.found
+
+    def coord(self) -> tuple:
+        """
+        获取坐标, 从roi随机获取坐标
+        """
+        x, y, w, h = self.roi
+        x += np.random.randint(0, max(1, w))
+        y += np.random.randint(0, max(1, h))
+        return int(x), int(y)
@@ -0,0 +1,117 @@
+"""
+OCR 结果缓存
+key 是截取之后的图片内容的 hash, 图片一样识别结果就一样, 和资源, 帧编号都无关
+票数, 分数这些区域大部分时间不变, 同样的图片不用再跑一次 ONNX 模型
+按最近使用淘汰, 可以设置过期时间
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+
+# 默认最多缓存的结果数, 每条只有几十字节的文字和坐标
+MAX_ENTRIES = 512
+
+class OcrCache:
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = 0.) -> None:
+        """
+        :param max_entries: 最多缓存的结果数, 0 表示不缓存
+        :param ttl: 结果的有效时间 (秒), 0 表示不过期
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._results: OrderedDict[tuple, tuple] = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0.  # 命中时省下的识别时间 (秒)
+
+    @staticmethod
+    def key(kind: str, image: np.ndarray) -> tuple:
+        """
+        :param kind: 识别方式, 同一张图片单行识别和检测加识别的结果不一样
+        """
+        data = np.ascontiguousarray(image)
+        digest = hashlib.blake2b(data.data, digest_size=16).digest()
+        return kind, data.shape, digest
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        :return: 缓存的识别结果, 没有或者过期返回None
+        """
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None:
+                value, cost, created = entry
+                if not self.ttl or time.time() - created <= self.ttl:
+                    self._results.move_to_end(key)
+                    self.hits += 1
+                    self.saved += cost
+                    return value
+                del self._results[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any, cost: float = 0.) -> None:
+        """
+        :param cost: 这次识别用的时间, 之后每次命中都算省下了这么多
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._results[key] = (value, cost, time.time())
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    def cached(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        有缓存时直接返回, 否则识别并缓存
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        start = time.perf_counter()
+        value = compute()
+        if value is not None:
+            self.set(key, value, time.perf_counter() - start)
+        return value
+
+    def configure(self, max_entries: int, ttl: float) -> None:
+        with self._lock:
+            self.max_entries = max_entries
+            self.ttl = ttl
+            while len(self._results) > max(0, max_entries):
+                self._results.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.
+
+    @property
+    def stats(self) -> str:
+        return f"hits: {self.hits}, misses: {self.misses}, hit ratio: {self.hit_ratio:.1%}, " \
+            f"saved: {self.saved:.2f}s, entries: {len(self._results)}"
+
+_cache: Optional[OcrCache] = None
+_cache_lock = Lock()
+
+def ocr_cache() -> OcrCache:
+    """
+    所有 RuleOcr 共用的缓存
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OcrCache()
+    return _cache
@@ -0,0 +1,247 @@
+"""
+OCR 引擎
+TextSystem 创建时会加载检测和识别两个 ONNX 模型, 要几秒和上百MB内存
+只在第一次使用 OCR 时创建, 所有 RuleOcr 共用同一个, 只导入资源的任务和配置编辑器不会加载模型
+启动时可以用 warm_up 在后台线程里预先加载并推理一次, 第一次 OCR 不用等
+ONNX Runtime 的线程数, 计算图优化和执行方式可以在加载之前用 configure 设置
+
+对比不同设置的耗时: py -m module.image_processing.ocr_engine benchmark [crops_folder]
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from module.base.logger import logger
+
+if TYPE_CHECKING:
+    from ppocronnx.predict_system import TextSystem
+
+_engine: Optional['TextSystem'] = None
+_lock = threading.Lock()
+_warm_up: Optional[threading.Thread] = None
+
+# 识别模型一次推理最多处理的区域数, ppocronnx 默认是6
+# RuleOcr.batch_read 一次读取的区域不超过这个数时只推理一次
+REC_BATCH_NUM = 16
+
+# ONNX Runtime 会话设置, 0 表示使用 onnxruntime 的默认值
+DEFAULT_SETTINGS = {
+    'intra_op_threads': 0,
+    'inter_op_threads': 0,
+    'graph_optimization': 'all',
+    'execution_mode': 'sequential',
+}
+_settings: dict = dict(DEFAULT_SETTINGS)
+
+GRAPH_OPTIMIZATION = {
+    'disable': 'ORT_DISABLE_ALL',
+    'basic': 'ORT_ENABLE_BASIC',
+    'extended': 'ORT_ENABLE_EXTENDED',
+    'all': 'ORT_ENABLE_ALL',
+}
+EXECUTION_MODE = {
+    'sequential': 'ORT_SEQUENTIAL',
+    'parallel': 'ORT_PARALLEL',
+}
+
+load_time: float = 0.  # 加载模型用的时间 (秒)
+load_memory: int = 0  # 加载模型之后进程常驻内存增加的字节数
+warm_up_time: float = 0.  # 第一次推理用的时间 (秒)
+
+def resident_size() -> int:
+    """
+    当前进程的常驻内存 (字节)
+    """
+    import psutil
+    return psutil.Process().memory_info().rss
+
+def configure(**settings) -> None:
+    """
+    设置 ONNX Runtime 会话, 在模型加载之前调用
+    :param settings: DEFAULT_SETTINGS 里的项
+    """
+    unknown = set(settings) - set(DEFAULT_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown OCR session settings: {', '.join(sorted(unknown))}")
+    # 配置里是 str 枚举, 统一成字符串
+    settings = {name: getattr(value, 'value', value) for name, value in settings.items()}
+    with _lock:
+        _settings.update(settings)
+    if loaded():
+        logger.warning("[OCR] Engine already loaded, session settings apply after restart")
+
+def session_options(settings: Optional[dict] = None):
+    """
+    :return: 按设置创建的 onnxruntime.SessionOptions
+    """
+    import onnxruntime
+    settings = {**DEFAULT_SETTINGS, **(settings or _settings)}
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = int(settings['intra_op_threads'])
+    options.inter_op_num_threads = int(settings['inter_op_threads'])
+    options.graph_optimization_level = getattr(onnxruntime.GraphOptimizationLevel,
+                                               GRAPH_OPTIMIZATION[settings['graph_optimization']])
+    options.execution_mode = getattr(onnxruntime.ExecutionMode, EXECUTION_MODE[settings['execution_mode']])
+    # 和 ppocronnx 一样只输出错误
+    options.log_severity_level = 3
+    return options
+
+# 创建模型会话的 ppocronnx 模块, 都是 import onnxruntime as ort
+MODEL_MODULES = ('ppocronnx.det.predict_det', 'ppocronnx.rec.predict_rec', 'ppocronnx.cls.predict_cls')
+_create_lock = threading.Lock()
+
+class _ConfiguredOrt:
+    """
+    代替 ppocronnx 模块里的 ort, 创建会话时使用传入的 SessionOptions, 其他属性都转给 onnxruntime
+    """
+
+    def __init__(self, options) -> None:
+        import onnxruntime
+        self._ort = onnxruntime
+        self._options = options
+
+    def __getattr__(self, name):
+        return getattr(self._ort, name)
+
+    def InferenceSession(self, model, sess_options=None, **kwargs):
+        return self._ort.InferenceSession(model, self._options, **kwargs)
+
+def create(settings: Optional[dict] = None) -> 'TextSystem':
+    """
+    按会话设置创建新的 TextSystem, 不影响共用的那个
+    ppocronnx 没有传入 SessionOptions 的参数, 创建期间把模块里的 ort 换成 _ConfiguredOrt,
+    每个模型只按设置加载一次
+    :param settings: None 时使用 configure 的设置
+    """
+    # 导入 ppocronnx 也会导入 onnxruntime, 一起推迟到这里
+    import importlib
+    from ppocronnx.predict_system import TextSystem
+    configured = _ConfiguredOrt(session_options(settings))
+    modules = [importlib.import_module(name) for name in MODEL_MODULES]
+    # 替换的是模块属性, 同时创建多个时要排队
+    with _create_lock:
+        originals = [module.ort for module in modules]
+        try:
+            for module in modules:
+                module.ort = configured
+            text_sys = TextSystem()
+        finally:
+            for module, original in zip(modules, originals):
+                module.ort = original
+    recognizer = text_sys.text_recognizer
+    recognizer.rec_batch_num = max(recognizer.rec_batch_num, REC_BATCH_NUM)
+    return text_sys
+
+def run_warm_up(text_sys: 'TextSystem') -> float:
+    """
+    检测和识别各推理一次, onnxruntime 第一次推理时才分配内存和选择算子实现
+    :return: 用的时间 (秒)
+    """
+    start = time.perf_counter()
+    text_sys.detect_and_ocr(np.full((64, 256, 3), 255, dtype=np.uint8))
+    text_sys.ocr_single_line(np.full((32, 128, 3), 255, dtype=np.uint8))
+    return time.perf_counter() - start
+
+def engine() -> 'TextSystem':
+    """
+    共用的 TextSystem, 第一次调用时加载, 后台预加载还没完成时等它完成
+    """
+    global _engine, load_time, load_memory
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                before = resident_size()
+                start = time.perf_counter()
+                text_sys = create()
+                load_time = time.perf_counter() - start
+                load_memory = max(0, resident_size() - before)
+                _engine = text_sys
+                logger.info(f"[OCR] Engine loaded in {load_time:.2f}s, "
+                            f"resident size +{load_memory / 1024 / 1024:.1f}MB, session {_settings}")
+    return _engine
+
+def loaded() -> bool:
+    return _engine is not None
+
+def warm_up() -> threading.Thread:
+    """
+    在后台线程里加载模型并推理一次, 多次调用只启动一次
+    """
+    global _warm_up
+    with _lock:
+        if _warm_up is None:
+            _warm_up = threading.Thread(target=_warm_up_run, name='OcrWarmUp', daemon=True)
+            _warm_up.start()
+    return _warm_up
+
+def _warm_up_run() -> None:
+    global warm_up_time
+    try:
+        warm_up_time = run_warm_up(engine())
+        logger.background(f"[OCR] Warm-up inference {warm_up_time * 1000:.0f}ms")
+    except Exception as e:
+        # 预加载失败不影响运行, 第一次使用时会再加载一次并报错
+        logger.warning(f"[OCR] Failed to warm up the engine: {e}")
+
+def stats() -> str:
+    if not loaded():
+        return "not loaded"
+    return f"load {load_time:.2f}s, warm-up {warm_up_time * 1000:.0f}ms, " \
+        f"resident +{load_memory / 1024 / 1024:.1f}MB"
+
+# benchmark 对比的设置, 每项只改默认值里的一个
+BENCHMARK_SETTINGS = [
+    {},
+    {'intra_op_threads': 1},
+    {'intra_op_threads': 2},
+    {'intra_op_threads': 4},
+    {'graph_optimization': 'disable'},
+    {'graph_optimization': 'basic'},
+    {'graph_optimization': 'extended'},
+    {'execution_mode': 'parallel'},
+    {'execution_mode': 'parallel', 'inter_op_threads': 2},
+]
+
+def benchmark(folder: str = './frames/digits', repeat: int = 1) -> None:
+    """
+    每种会话设置分别加载模型, 在保存的截图上测检测和识别的平均耗时
+    :param folder: 保存的 OCR 区域截图, 比如 digit_reader crop 的输出
+    """
+    import cv2
+    images = [image for image in (cv2.imread(str(file)) for file in sorted(Path(folder).glob('*.png')))
+              if image is not None and image.size]
+    if not images:
+        logger.error(f"[OCR] No crops in {folder}")
+        return
+    logger.info(f"[OCR] {len(images)} crops, {repeat} rounds per setting")
+    for settings in BENCHMARK_SETTINGS:
+        settings = {**DEFAULT_SETTINGS, **settings}
+        start = time.perf_counter()
+        text_sys = create(settings)
+        load = time.perf_counter() - start
+        warm_up = run_warm_up(text_sys)
+        detect = recognize = 0.
+        for _ in range(repeat):
+            for image in images:
+                start = time.perf_counter()
+                text_sys.text_detector(image)
+                detect += time.perf_counter() - start
+                start = time.perf_counter()
+                text_sys.ocr_single_line(image)
+                recognize += time.perf_counter() - start
+        count = repeat * len(images)
+        logger.info(f"[OCR] {settings}: load {load:.2f}s, warm-up {warm_up * 1000:.0f}ms, "
+                    f"detect {detect / count * 1000:.2f}ms, recognize {recognize / count * 1000:.2f}ms")
+        del text_sys
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != 'benchmark':
+        logger.error("Missing command, choose from: benchmark")
+        logger.warning("Format: py -m module.image_processing.ocr_engine benchmark [crops_folder]")
+    else:
+        benchmark(*sys.argv[2:3])
@@ -0,0 +1,112 @@
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from module.image_processing import resolution
+from module.image_processing.rule_image import RuleImage
+
+class PixelProbe:
+    """
+    固定位置的像素颜色探针
+    只读几个点的颜色, 用来预判弹窗之类固定位置的目标有没有出现
+    比模板匹配便宜得多, 探针命中之后才需要做完整的模板匹配
+    指定 area 时这组点可以在 area 里整体平移, 任意一个位置命中都算命中
+    """
+
+    # 每个点取 (2*RADIUS+1) 见方的均值, 对一两个像素的偏移不敏感
+    RADIUS = 2
+
+    def __init__(self, name: str, points: list[tuple[int, int, tuple]],
+                 tolerance: int = 40, min_hits: int = 0, area: Optional[tuple] = None) -> None:
+        """
+        :param points: [(x, y, (b, g, r))] 截图坐标和期望的颜色
+        :param tolerance: 每个通道允许的最大差异
+        :param min_hits: 至少有几个点颜色一致才算命中, 0 表示超过60%
+        :param area: (x, y, w, h) 目标可能出现的范围, 点的位置可以在里面平移
+        """
+        self.name = name
+        self.points = points
+        self.area = area
+        self.tolerance = tolerance
+        self.min_hits = min_hits or max(1, int(len(points) * 0.6 + 0.5))
+        # from_rule 生成的探针在截图分辨率变化时重新取点
+        self._size = resolution.size()
+        self._source: Optional[tuple] = None
+
+    @classmethod
+    def from_rule(cls, rule: RuleImage, grid: int = 3, tolerance: int = 40) -> 'PixelProbe':
+        """
+        在模板图片上均匀取 grid x grid 个点, 换算到 roi 的位置作为探针
+        模板在 area 里的任何位置都能被探针发现, 和模板匹配的搜索范围一样
+        """
+        template = rule.image
+        x, y = int(rule.roi[0]), int(rule.roi[1])
+        points = []
+        if template is not None:
+            h, w = template.shape[:2]
+            for i in range(1, grid + 1):
+                for j in range(1, grid + 1):
+                    px, py = w * j // (grid + 1), h * i // (grid + 1)
+                    color = cls._mean(template, px, py)
+                    points.append((x + px, y + py, color))
+        probe = cls(rule.name, points, tolerance, area=tuple(int(v) for v in rule.area))
+        probe._source = (rule, grid)
+        return probe
+
+    @classmethod
+    def _mean(cls, image: np.ndarray, x: int, y: int) -> tuple:
+        r = cls.RADIUS
+        patch = image[max(0, y - r): y + r + 1, max(0, x - r): x + r + 1]
+        return tuple(int(v) for v in patch.reshape(-1, patch.shape[-1]).mean(axis=0))
+
+    def check(self, image: np.ndarray) -> bool:
+        """
+        :return: 探针命中, 目标可能出现了
+        """
+        if self._source is not None and self._size != resolution.size():
+            rule, grid = self._source
+            probe = self.from_rule(rule, grid, self.tolerance)
+            self.points, self.area = probe.points, probe.area
+            self._size = resolution.size()
+        if image is None or not self.points:
+            return True  # 没法判断的时候交给模板匹配
+        if self.area is not None:
+            return self._check_area(image)
+        h, w = image.shape[:2]
+        hits = 0
+        for x, y, color in self.points:
+            if x >= w or y >= h:
+                continue
+            actual = self._mean(image, x, y)
+            if all(abs(a - c) <= self.tolerance for a, c in zip(actual, color)):
+                hits += 1
+                if hits >= self.min_hits:
+                    return True
+        return False
+
+    def _check_area(self, image: np.ndarray) -> bool:
+        """
+        所有点一起在 area 里平移, 每个平移位置统计颜色一致的点数
+        area 先做一次均值滤波, 每个点在所有平移位置的颜色就是滤波结果里的一块
+        """
+        ax, ay, aw, ah = self.area
+        h, w = image.shape[:2]
+        x1, y1 = max(0, ax), max(0, ay)
+        x2, y2 = min(w, ax + aw), min(h, ay + ah)
+        xs = [x for x, _, _ in self.points]
+        ys = [y for _, y, _ in self.points]
+        # 平移范围: 所有点都留在 area 里
+        dx_min, dx_max = x1 - min(xs), x2 - 1 - max(xs)
+        dy_min, dy_max = y1 - min(ys), y2 - 1 - max(ys)
+        if dx_min > dx_max or dy_min > dy_max:
+            return True  # area 放不下这些点, 交给模板匹配
+        size = 2 * self.RADIUS + 1
+        blurred = cv2.blur(image[y1:y2, x1:x2], (size, size)).astype(np.int16)
+        hits = np.zeros((dy_max - dy_min + 1, dx_max - dx_min + 1), dtype=np.int16)
+        for x, y, color in self.points:
+            left, top = x + dx_min - x1, y + dy_min - y1
+            patch = blurred[top: top + hits.shape[0], left: left + hits.shape[1]]
+            diff = np.abs(patch - np.array(color, dtype=np.int16).reshape(1, 1, -1))
+            hits += (diff <= self.tolerance).all(axis=2)
+        return bool(hits.max() >= self.min_hits)
@@ -0,0 +1,147 @@
+"""
+截图分辨率
+资源 json 里的 roi, area 和模板图片都是在 1280x720 的截图上截取的
+模拟器使用更低的分辨率 (960x540, 640x360) 时, 截图更小, 解码和匹配都更快
+第一次拿到这个大小的截图时把所有资源的坐标和模板缩放到截图的大小, 之后的识别和点击都在截图坐标里
+截图大小和模拟器的屏幕大小 (点击坐标) 不一样时, 点击之前再换算一次
+资源是所有任务共用的类属性, 缩放之后的坐标和模板是整个进程共用的
+一个进程里同时运行多个模拟器 (配置编辑器同时运行多个配置) 时, 它们的截图大小和屏幕大小必须一样
+Device 调用时传入自己作为 owner, 和进程里其他模拟器的大小不一样时报错, 每个模拟器需要单独的进程
+
+验证: py -m module.image_processing.benchmark resolution [frames_folder]
+"""
+import weakref
+from threading import Lock
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from module.base.exception import RequestHumanTakeover
+from module.base.logger import logger
+
+# 资源声明时使用的分辨率
+DESIGN_SIZE = (1280, 720)
+
+_size: tuple = DESIGN_SIZE  # 当前截图的大小
+_input_size: Optional[tuple] = None  # 模拟器屏幕的大小, None 表示和截图一样
+_rules = weakref.WeakSet()  # 所有的资源, 分辨率变化时缩放
+_owners = weakref.WeakKeyDictionary()  # {Device: {'size': 截图大小, 'input': 屏幕大小}}
+_lock = Lock()
+
+def size() -> tuple:
+    """
+    :return: (w, h) 当前截图的大小
+    """
+    return _size
+
+def is_design() -> bool:
+    return _size == DESIGN_SIZE
+
+def factor() -> tuple:
+    """
+    :return: (x 方向, y 方向) 截图相对 1280x720 的缩放比例
+    """
+    return _size[0] / DESIGN_SIZE[0], _size[1] / DESIGN_SIZE[1]
+
+def point(x, y) -> tuple:
+    """
+    1280x720 的坐标换算到截图坐标, 代码里写死的坐标用这个
+    """
+    fx, fy = factor()
+    return int(round(x * fx)), int(round(y * fy))
+
+def rect(rect, pad: int = 0) -> tuple:
+    """
+    1280x720 的 (x, y, w, h) 换算到截图坐标
+    :param pad: 缩放时四周再扩大的像素, 搜索区域扩大一点, 取整的误差不会让模板放不下
+    """
+    x, y, w, h = [float(v) for v in rect]
+    fx, fy = factor()
+    sx, sy = int(round(x * fx)), int(round(y * fy))
+    # 大小为0的区域 (比如只有起点的滑动) 保持为0
+    sw = max(1, int(round(w * fx))) if w > 0 else int(w)
+    sh = max(1, int(round(h * fy))) if h > 0 else int(h)
+    if pad and sw > 0 and sh > 0 and not is_design():
+        x1, y1 = max(0, sx - pad), max(0, sy - pad)
+        x2, y2 = min(_size[0], sx + sw + pad), min(_size[1], sy + sh + pad)
+        return x1, y1, x2 - x1, y2 - y1
+    return sx, sy, sw, sh
+
+def template(image: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    """
+    模板缩放到截图的比例, 1280x720 时原样返回
+    """
+    if image is None or is_design():
+        return image
+    fx, fy = factor()
+    h, w = image.shape[:2]
+    dsize = (max(1, int(round(w * fx))), max(1, int(round(h * fy))))
+    return cv2.resize(image, dsize, interpolation=cv2.INTER_AREA)
+
+def to_input(x, y) -> tuple:
+    """
+    截图坐标换算到点击坐标
+    """
+    if _input_size is None or _input_size == _size:
+        return int(x), int(y)
+    return (int(round(x * _input_size[0] / _size[0])),
+            int(round(y * _input_size[1] / _size[1])))
+
+def register(rule) -> None:
+    """
+    资源创建时登记, 分辨率变化时调用 rule.rescale()
+    已经不是 1280x720 时马上缩放
+    """
+    with _lock:
+        _rules.add(rule)
+    if not is_design():
+        rule.rescale()
+
+def _claim(owner, kind: str, value: tuple) -> None:
+    """
+    记录 owner 使用的大小, 进程里其他还在使用的模拟器大小不一样时报错
+    :param kind: 'size' 截图大小, 'input' 屏幕大小
+    """
+    if owner is None:
+        return
+    with _lock:
+        for other, sizes in _owners.items():
+            if other is not owner and sizes.get(kind, value) != value:
+                raise RequestHumanTakeover(
+                    f"[Resolution] {kind} {value[0]}x{value[1]} conflicts with another device "
+                    f"in this process ({sizes[kind][0]}x{sizes[kind][1]}), "
+                    f"run emulators with different resolutions in separate processes")
+        _owners.setdefault(owner, {})[kind] = value
+
+def set_size(width: int, height: int, owner=None) -> bool:
+    """
+    截图的大小变化时缩放所有的资源, 模板在下一次使用时按新的比例生成
+    :param owner: 截图的 Device, 用来检查进程里的多个模拟器大小一样
+    :return: 大小是否变化了
+    """
+    global _size
+    new_size = (int(width), int(height))
+    _claim(owner, 'size', new_size)
+    if new_size == _size:
+        return False
+    if new_size[0] * DESIGN_SIZE[1] != new_size[1] * DESIGN_SIZE[0]:
+        logger.warning(f"[Resolution] {new_size[0]}x{new_size[1]} is not 16:9, "
+                       f"assets will be stretched")
+    with _lock:
+        _size = new_size
+        rules = list(_rules)
+    for rule in rules:
+        rule.rescale()
+    logger.info(f"[Resolution] Capture size {new_size[0]}x{new_size[1]}, rescaled {len(rules)} assets")
+    return True
+
+def set_input_size(width: int, height: int, owner=None) -> None:
+    """
+    :param width: 模拟器屏幕的宽, 横屏
+    :param owner: 同 set_size
+    """
+    global _input_size
+    _claim(owner, 'input', (int(width), int(height)))
+    _input_size = (int(width), int(height))
+    logger.background(f"[Resolution] Input size {width}x{height}")
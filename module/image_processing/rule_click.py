@@ -1,6 +1,7 @@
 
 import numpy as np
 from module.base.logger import logger
+from module.image_processing import resolution
 
 class RuleClick:
 
@@ -15,6 +16,18 @@ class RuleClick:
         if name:
             self.name = name
 
+        # 1280x720 的坐标, 截图分辨率变化时从这里重新换算
+        self._design_roi = tuple(roi)
+        self._design_area = tuple(area)
+        resolution.register(self)
+
+    def rescale(self) -> None:
+        """
+        截图分辨率变化时重新换算 roi 和 area
+        """
+        self.roi = resolution.rect(self._design_roi)
+        self.area = resolution.rect(self._design_area)
+
     def coord(self) -> tuple:
         """
         获取坐标, 从roi随机获取坐标
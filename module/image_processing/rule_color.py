@@ -0,0 +1,155 @@
+"""
+颜色规则
+开关是红色还是黄色, 指示灯亮没亮这类检查不需要模板匹配
+只比较区域里的像素颜色, 只需要几十微秒
+"""
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from module.base.logger import logger
+from module.image_processing.frame import unwrap
+from module.image_processing.match_cache import MatchCache
+from module.image_processing.match_result import MatchResult
+from module.image_processing import resolution
+
+class RuleColor:
+
+    def __init__(self, name: str, roi: tuple, area: tuple, color: tuple,
+                 tolerance: int = 30, ratio: float = 0.6) -> None:
+        """
+        初始化
+        :param roi: 颜色块的位置和大小
+        :param area: 颜色块可能出现的区域, 和 roi 一样时只检查 roi
+        :param color: (r, g, b) 期望的颜色, 和取色工具显示的顺序一样
+        :param tolerance: 每个通道允许的最大差异
+        :param ratio: roi 大小的窗口里至少有这个比例的像素颜色一致才算出现
+        """
+        self.name = name.upper()
+        self.roi: list = list(roi)
+        self.area = area
+        self.color = tuple(int(v) for v in color)
+        self.tolerance = tolerance
+        self.ratio = ratio
+
+        bgr = np.array(self.color[::-1], dtype=np.int32)
+        self.lower = np.clip(bgr - tolerance, 0, 255).astype(np.uint8)
+        self.upper = np.clip(bgr + tolerance, 0, 255).astype(np.uint8)
+
+        # 1280x720 的坐标, 截图分辨率变化时从这里重新换算
+        self._design_roi = tuple(roi)
+        self._design_area = tuple(area)
+        resolution.register(self)
+
+    def rescale(self) -> None:
+        """
+        截图分辨率变化时重新换算 roi 和 area, 颜色和比例不变
+        """
+        self.roi = list(resolution.rect(self._design_roi))
+        self.area = resolution.rect(self._design_area, pad=1)
+
+    def mask(self, image: np.ndarray) -> np.ndarray:
+        """
+        颜色在范围内的像素为255, 其他为0
+        """
+        return cv2.inRange(image, self.lower, self.upper)
+
+    def match_roi(self, screenshot) -> Optional[tuple]:
+        """
+        只检查 roi 里颜色一致的像素比例
+        :return: (比例, (x, y)), roi 超出截图时返回None
+        """
+        x, y, w, h = [int(v) for v in self.roi]
+        patch = screenshot[max(0, y): y + h, max(0, x): x + w]
+        if x < 0 or y < 0 or w <= 0 or h <= 0 or patch.shape[:2] != (h, w):
+            return None
+        return cv2.countNonZero(self.mask(patch)) / (w * h), (x, y)
+
+    def roi_in_area(self) -> bool:
+        x, y, w, h = [int(v) for v in self.roi]
+        ax, ay, aw, ah = [int(v) for v in self.area]
+        return ax <= x and ay <= y and x + w <= ax + aw and y + h <= ay + ah
+
+    def match_area(self, screenshot) -> tuple:
+        """
+        在 area 里找颜色一致的像素最多的 roi 大小的窗口
+        :return: (比例, (x, y)), 区域里颜色一致的像素不够时位置为None
+        """
+        ax, ay, aw, ah = [int(v) for v in self.area]
+        w, h = int(self.roi[2]), int(self.roi[3])
+        region = screenshot[max(0, ay): ay + ah, max(0, ax): ax + aw]
+        if region.shape[0] < h or region.shape[1] < w or w <= 0 or h <= 0:
+            return 0., None
+        mask = self.mask(region)
+        # 整个区域的像素都不够一个窗口, 不用再找位置
+        if cv2.countNonZero(mask) < self.ratio * w * h:
+            return 0., None
+
+        density = cv2.boxFilter(mask, cv2.CV_32F, (w, h), normalize=True,
+                                borderType=cv2.BORDER_CONSTANT)
+        _, score, _, (cx, cy) = cv2.minMaxLoc(density)
+        x = min(max(cx - w // 2, 0), region.shape[1] - w)
+        y = min(max(cy - h // 2, 0), region.shape[0] - h)
+        return score / 255., (x + max(0, ax), y + max(0, ay))
+
+    def match(self, screenshot, threshold: Optional[float] = None, cropped=False,
+              cache: Optional[MatchCache] = None, engine: Optional[str] = None) -> MatchResult:
+        """
+        先检查 roi, 不一致时再在 area 里找, 不修改 roi
+        area 被动态修改之后 roi 可能已经不在 area 里, 这时直接在 area 里找
+        :param threshold: 颜色规则使用自己的 ratio, 传入的阈值只是为了和 RuleImage 的用法一致
+        :param cropped: 兼容 RuleImage 的参数, 颜色规则总是使用完整的截图
+        :param engine: 兼容 RuleImage 的参数, 颜色规则不做模板匹配
+        """
+        screenshot, frame = unwrap(screenshot)
+        result = self.match_roi(screenshot) if self.roi_in_area() else None
+        if result is None or result[0] < self.ratio:
+            if tuple(self.area) != tuple(self.roi):
+                result = self.match_area(screenshot)
+            elif result is None:
+                result = (0., None)
+        logger.background(f"[Color] {self.name} ratio: {result[0]:.3f}")
+        size = (int(self.roi[2]), int(self.roi[3]))
+        if cache is not None:
+            frame_id = cache.frame_id
+        else:
+            frame_id = frame.frame_id if frame is not None else 0
+        return MatchResult(self.name, float(result[0]), result[1], size, self.ratio, frame_id)
+
+    def match_target(self, screenshot, threshold: Optional[float] = None, debug=False, cropped=False,
+                     cache: Optional[MatchCache] = None, engine: Optional[str] = None) -> bool:
+        """
+        兼容 RuleImage 的用法: 匹配成功时把位置写回 roi
+        """
+        result = self.match(screenshot, threshold, cropped, cache)
+        if not result.found:
+            return False
+        self.remember(result)
+        return True
+
+    def remember(self, result: MatchResult) -> None:
+        """
+        把找到的位置写回 roi, 之后 click(资源) 会点击这个位置
+        """
+        self.roi[0], self.roi[1] = result.loc
+        logger.background(f"[Color] {self.name} updated roi: {self.roi}")
+
+    def coord(self) -> tuple:
+        """
+        获取坐标, 从roi随机获取坐标
+        :return:
+        """
+        x, y, w, h = self.roi
+        x += np.random.randint(0, max(1, w))
+        y += np.random.randint(0, max(1, h))
+        logger.background(f"[Click] {self.name} coord: {x}, {y}")
+        return int(x), int(y)
+
+    def roi_center(self) -> tuple:
+        """
+        获取roi的中心坐标
+        :return:
+        """
+        x, y, w, h = self.roi
+        return int(x + w // 2), int(y + h // 2)
@@ -3,9 +3,22 @@ from pathlib import Path
 from random import Random
 import cv2
 import numpy as np
+import time
 from typing import Optional
 
 from module.base.logger import logger
+from module.base.stats import TimingStats
+from module.image_processing.match_cache import MatchCache
+from module.image_processing.frame import Frame, unwrap
+from module.image_processing.match_result import MatchResult
+from module.image_processing import grid
+from module.image_processing import resolution
+from module.image_processing import template_atlas
+from module.image_processing.match_engine import get_engine
+from module.image_processing.area_store import AreaStore, area_store
+
+# 每个资源在上次位置直接匹配的命中/未命中次数和耗时
+fast_path_stats = TimingStats('FastPath')
 
 class RuleImage:
     def __init__(self, name: str, roi: tuple, area: tuple, file: str) -> None:
@@ -24,17 +37,52 @@ class RuleImage:
         self.area = area
         self.file = file
 
-    def crop(self, screenshot) -> np.ndarray:
+        # json 里声明的区域, 学习到的搜索区域只在 area 没有被动态修改时使用
+        self._declared_area = tuple(area)
+        self._area_key = AreaStore.key(self.name, area)
+        self._learned_miss = False  # 在学习到的区域里没有匹配到, 下次直接用完整的 area
+
+        # 1280x720 的坐标, 截图分辨率变化时从这里重新换算
+        self._design_roi = tuple(roi)
+        self._design_area = tuple(area)
+        resolution.register(self)
+
+    def rescale(self) -> None:
+        """
+        截图分辨率变化时重新换算 roi 和 area, 模板在下一次使用时按新的比例缩放
+        学习到的区域按换算后的 area 分开记录
+        """
+        self.roi = list(resolution.rect(self._design_roi))
+        self.area = resolution.rect(self._design_area, pad=1)
+        self._declared_area = tuple(self.area)
+        self._area_key = AreaStore.key(self.name, self.area)
+        self._learned_miss = False
+        self._image = None
+
+    @property
+    def search_area(self) -> tuple:
+        """
+        实际搜索的区域: 学习到的区域, 没有或者上次没有匹配到时用 area
+        """
+        if self._learned_miss or tuple(self.area) != self._declared_area or self.image is None:
+            return self.area
+        h, w = self.image.shape[:2]
+        return area_store().window(self._area_key, self.area, (w, h)) or self.area
+
+    def crop(self, screenshot, area: Optional[tuple] = None) -> np.ndarray:
         """
         截取图片
+        :param screenshot: 截图或者 Frame
+        :param area: 默认为 self.area
         """
-        x, y, w, h = int(self.area[0]), int(
-            self.area[1]), int(self.area[2]), int(self.area[3])
+        screenshot, _ = unwrap(screenshot)
+        area = self.area if area is None else area
+        x, y, w, h = int(area[0]), int(area[1]), int(area[2]), int(area[3])
 
         # Add bounds checking and validation
         if h <= 0 or w <= 0:
             logger.warning(
-                f"[Image] {self.name} Invalid area dimensions: {self.area} (w={w}, h={h})")
+                f"[Image] {self.name} Invalid area dimensions: {area} (w={w}, h={h})")
             # Return whole screenshot
             return screenshot
 
@@ -71,8 +119,12 @@ class RuleImage:
         if self._image is not None:
             return
 
-        image = cv2.imread(self.file)
-        self._image = image
+        # 优先使用预先打包的图集, 图集里没有或者已经过期时单独读取
+        image = template_atlas.atlas().get(self.file)
+        if image is None:
+            image = cv2.imread(self.file)
+        # 截图不是 1280x720 时缩放到截图的比例
+        self._image = resolution.template(image)
 
     def roi_center(self) -> tuple:
         """
@@ -100,32 +152,230 @@ class RuleImage:
         x, y, w, h = self.roi
         return {'w': w, 'h': h}
 
-    def match_target(self, screenshot, threshold=0.9, debug=False, cropped=False) -> bool:
+    def match_score(self, screenshot, cropped=False, area: Optional[tuple] = None,
+                    engine: Optional[str] = None) -> tuple:
+        """
+        计算匹配度
+        :param area: 搜索的区域, 默认为 self.area
+        :param engine: 匹配后端, 见 match_engine, 默认 opencv
+        :return: (匹配度, 匹配位置左上角坐标), 无法匹配时位置为None
+        """
+        area = self.area if area is None else area
         if not cropped:
-            screenshot = self.crop(screenshot)
+            screenshot = self.crop(screenshot, area)
         target = self.image
         if target is None:
             logger.error(f"[Image] {self.name} failed to load target image")
-            return False
+            return 0., None
 
         # Check if template is larger than screenshot
         if target.shape[0] > screenshot.shape[0] or target.shape[1] > screenshot.shape[1]:
             logger.warning(
                 f"[Image] {self.name} template size ({target.shape[1]}x{target.shape[0]}) is larger than screenshot size ({screenshot.shape[1]}x{screenshot.shape[0]}), skipping match")
-            return False
+            return 0., None
 
-        result = cv2.matchTemplate(screenshot, target, cv2.TM_CCORR_NORMED)
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+        max_val, max_loc = get_engine(engine).match(screenshot, target, self.file)
         logger.background(f"[Image] {self.name} match rate: {max_val}")
+        return max_val, (max_loc[0] + area[0], max_loc[1] + area[1])
+
+    @staticmethod
+    def match_score_many(screenshot, targets: list['RuleImage'], area: tuple,
+                         engine: Optional[str] = None) -> dict:
+        """
+        同一个区域的多个图片一起匹配, 支持批量的后端 (fft) 只处理一次区域
+        :return: {RuleImage: match_score 的结果}
+        """
+        scores = {}
+        batch = []
+        for target in targets:
+            if target.image is None:
+                scores[target] = target.match_score(screenshot, area=area, engine=engine)
+            else:
+                batch.append(target)
+        if len(batch) == 1:
+            # 只有一个图片时区域的傅里叶变换省不下来, matchTemplate 更快
+            scores[batch[0]] = batch[0].match_score(screenshot, area=area)
+            return scores
+        if not batch:
+            return scores
+
+        x, y = int(area[0]), int(area[1])
+        image = batch[0].crop(screenshot, area)
+        results = get_engine(engine).match_many(
+            image, [target.image for target in batch], [target.file for target in batch])
+        for target, (score, loc) in zip(batch, results):
+            logger.background(f"[Image] {target.name} match rate: {score}")
+            scores[target] = (score, None if loc is None else (loc[0] + x, loc[1] + y))
+        return scores
+
+    def match_all(self, screenshot, threshold: float = 0.9, area: Optional[tuple] = None) -> list[tuple]:
+        """
+        找出 area 里所有出现的位置, 一次匹配加非极大值抑制
+        不更新 roi
+        :param area: 搜索的区域, 默认为 self.area
+        :return: [(匹配度, (x, y))], 按匹配度从高到低
+        """
+        area = self.area if area is None else area
+        target = self.image
+        if target is None:
+            logger.error(f"[Image] {self.name} failed to load target image")
+            return []
+        image = self.crop(screenshot, area)
+        h, w = target.shape[:2]
+        if image.shape[0] < h or image.shape[1] < w:
+            return []
+
+        result = cv2.matchTemplate(image, target, cv2.TM_CCORR_NORMED)
+        x, y = int(area[0]), int(area[1])
+        occurrences = [(score, (loc[0] + x, loc[1] + y))
+                       for score, loc in grid.non_max_suppression(result, threshold, (w, h))]
+        logger.background(f"[Image] {self.name} found {len(occurrences)} occurrences")
+        return occurrences
+
+    def match_roi(self, screenshot) -> Optional[tuple]:
+        """
+        只在上一次匹配到的位置 (roi 左上角) 计算一次匹配度
+        :return: 同 match_score, roi 超出截图时返回None
+        """
+        target = self.image
+        if target is None:
+            return None
+        screenshot, _ = unwrap(screenshot)
+        x, y = int(self.roi[0]), int(self.roi[1])
+        h, w = target.shape[:2]
+        patch = screenshot[max(0, y): y + h, max(0, x): x + w]
+        if x < 0 or y < 0 or patch.shape[:2] != (h, w):
+            return None
+        score = float(cv2.matchTemplate(patch, target, cv2.TM_CCORR_NORMED)[0, 0])
+        return score, (x, y)
+
+    def roi_in_area(self, area: tuple) -> bool:
+        """
+        roi 左上角开始的模板大小的区域是否在 area 里, 不在时 roi 上的匹配不能代替 area 里的搜索
+        """
+        target = self.image
+        if target is None:
+            return False
+        x, y = int(self.roi[0]), int(self.roi[1])
+        h, w = target.shape[:2]
+        ax, ay, aw, ah = [int(v) for v in area]
+        return ax <= x and ay <= y and x + w <= ax + aw and y + h <= ay + ah
+
+    def match_fast(self, screenshot, threshold: float, area: tuple) -> Optional[tuple]:
+        """
+        静态按钮大多还在上次的位置, 先在 roi 上直接匹配, 达到阈值就不用在整个 area 里搜索
+        只是下限, 不放进匹配缓存, 更高阈值的检查还是会完整搜索
+        :param area: 这次要搜索的区域, roi 不在里面时不走快速路径
+        :return: 达到阈值时返回 match_roi 的结果, 否则None
+        """
+        if not self.roi_in_area(area):
+            return None
+        start = time.perf_counter()
+        result = self.match_roi(screenshot)
+        hit = result is not None and result[0] >= threshold
+        fast_path_stats.add(f"{self.name}.{'hit' if hit else 'miss'}", time.perf_counter() - start)
+        return result if hit else None
+
+    def match(self, screenshot, threshold=0.9, cropped=False,
+              cache: Optional[MatchCache] = None, engine: Optional[str] = None) -> MatchResult:
+        """
+        匹配并返回结果, 不修改 roi, 多个线程可以同时匹配同一个资源
+        :param screenshot: 截图或者 Frame, 传入 Frame 时共用这一帧的灰度图和缩小图
+        :param cache: 当前帧的匹配缓存, 同一帧重复检查时不再重新匹配
+        :param engine: 匹配后端, 见 match_engine, 默认 opencv
+        """
+        key = None
+        result = None
+        area = self.area if cropped else self.search_area
+        if cache is not None and not cropped:
+            key = cache.key(self.name, area)
+            result = cache.get(key)
+        if result is None and not cropped:
+            result = self.match_fast(screenshot, threshold, area)
+        if result is None:
+            result = self.match_score(screenshot, cropped, area, engine)
+            if key is not None:
+                cache.set(key, result)
+
+        if self.passed(result, threshold):
+            if not cropped:
+                self.learn(result[1])
+        elif self.learned_miss(area):
+            return self.match(screenshot, threshold, cropped, cache, engine)
+        return self.result(result, threshold, cache, unwrap(screenshot)[1])
+
+    def result(self, result: tuple, threshold: float = 0.,
+               cache: Optional[MatchCache] = None, frame: Optional[Frame] = None) -> MatchResult:
+        """
+        把 match_score 的结果转换为 MatchResult
+        """
+        if self.image is not None:
+            size = (self.image.shape[1], self.image.shape[0])
+        else:
+            size = (int(self.roi[2]), int(self.roi[3]))
+        loc = None if result[1] is None else (int(result[1][0]), int(result[1][1]))
+        if cache is not None:
+            frame_id = cache.frame_id
+        else:
+            frame_id = frame.frame_id if frame is not None else 0
+        return MatchResult(self.name, float(result[0]), loc, size, threshold, frame_id)
+
+    @staticmethod
+    def passed(result: tuple, threshold: float) -> bool:
+        return result[1] is not None and result[0] >= threshold
+
+    def match_target(self, screenshot, threshold=0.9, debug=False, cropped=False,
+                     cache: Optional[MatchCache] = None, engine: Optional[str] = None) -> bool:
+        """
+        兼容旧的用法: 匹配成功时把位置写回 roi
+        新的代码用 match, 点击时直接使用返回的 MatchResult
+        :param cache: 当前帧的匹配缓存, 同一帧重复检查时不再重新匹配
+        :param engine: 匹配后端, 见 match_engine, 默认 opencv
+        """
+        result = self.match(screenshot, threshold, cropped, cache, engine)
+        if not result.found:
+            return False
+        self.remember(result)
+        if debug:
+            self.draw_and_save(unwrap(screenshot)[0])
+        return True
+
+    def learned_miss(self, area: tuple) -> bool:
+        """
+        在学习到的区域里没有匹配到时调用, 之后回到完整的 area 搜索
+        :return: area 是学习到的区域, 需要在完整的 area 里再匹配一次
+        """
+        if area is self.area or tuple(area) == tuple(self.area):
+            return False
+        self._learned_miss = True
+        return True
+
+    def learn(self, loc: tuple) -> None:
+        """
+        记录匹配位置, 用来学习搜索区域
+        """
+        if tuple(self.area) == self._declared_area:
+            area_store().record(self._area_key, loc)
+            self._learned_miss = False
+
+    def remember(self, result: MatchResult) -> None:
+        """
+        兼容旧的用法: 把匹配位置写回 roi, 之后 click(资源) 会点击这个位置
+        """
+        self.roi[0], self.roi[1] = result.loc
+        logger.background(f"[Image] {self.name} updated roi: {self.roi}")
 
-        if max_val >= threshold:
-            self.roi[0] = max_loc[0] + self.area[0]
-            self.roi[1] = max_loc[1] + self.area[1]
-            logger.background(f"[Image] {self.name} updated roi: {self.roi}")
-            if debug:
-                self.draw_and_save(screenshot)
-            return True
-        return False
+    def accept(self, result: tuple, threshold: float, learn: bool = True) -> bool:
+        """
+        兼容旧的用法: 判断 match_score 的结果是否达到阈值, 达到就更新roi
+        :param learn: 记录匹配位置, 用来学习搜索区域
+        """
+        if not self.passed(result, threshold):
+            return False
+        if learn:
+            self.learn(result[1])
+        self.remember(self.result(result, threshold))
+        return True
 
     def draw_and_save(self, screenshot):
         """For test ONLY
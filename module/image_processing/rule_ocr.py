@@ -4,13 +4,19 @@ import re
 import time
 import cv2
 import numpy as np
-from ppocronnx.predict_system import TextSystem, BoxedResult
-from typing import List, Tuple, Optional, Any, cast
+from typing import TYPE_CHECKING, List, Tuple, Optional, Any, cast
 
 from module.base.logger import logger
 from module.base.utils import float2str, merge_area
+from module.image_processing.match_result import OcrResult
+from module.image_processing.frame import unwrap
+from module.image_processing import resolution
+from module.image_processing import ocr_engine
+from module.image_processing.ocr_cache import OcrCache, ocr_cache
+from module.image_processing import digit_reader
 
-text_sys = TextSystem()
+if TYPE_CHECKING:
+    from ppocronnx.predict_system import TextSystem, BoxedResult
 
 class RuleOcr:
     roi: tuple = ()
@@ -18,11 +24,27 @@ class RuleOcr:
     keyword: str = ""
     score: float = 0.8  # 阈值默认为0.5
 
-    def __init__(self, name: str, roi: tuple, area: tuple, keyword: str) -> None:
+    def __init__(self, name: str, roi: tuple, area: tuple, keyword: str, digits: bool = False) -> None:
+        """
+        :param digits: 区域里只有数字, '/' 和 ',', 先用字形模板读取, 置信度不够时再用 ONNX 识别
+        """
         self.name = name.upper()
         self.roi = roi
         self.area = area
         self.keyword = keyword
+        self.digits = digits
+
+        # 1280x720 的坐标, 截图分辨率变化时从这里重新换算
+        self._design_roi = tuple(roi)
+        self._design_area = tuple(area)
+        resolution.register(self)
+
+    def rescale(self) -> None:
+        """
+        截图分辨率变化时重新换算 roi 和 area
+        """
+        self.roi = resolution.rect(self._design_roi)
+        self.area = resolution.rect(self._design_area, pad=1)
 
     @cached_property
     def name(self) -> str:
@@ -33,12 +55,12 @@ class RuleOcr:
         return self.name.upper()
 
     @cached_property
-    def model(self) -> TextSystem:
+    def model(self) -> 'TextSystem':
         """Get the OCR text system model instance
 
-        :return: TextSystem instance for OCR processing
+        :return: 所有 RuleOcr 共用的 TextSystem, 第一次使用时加载
         """
-        return text_sys
+        return ocr_engine.engine()
 
     def coord(self) -> tuple:
         """
@@ -53,7 +75,9 @@ class RuleOcr:
     def crop(self, screenshot) -> np.ndarray:
         """
         截取图片
+        :param screenshot: 截图或者 Frame
         """
+        screenshot, _ = unwrap(screenshot)
         x, y, w, h = int(self.area[0]), int(
             self.area[1]), int(self.area[2]), int(self.area[3])
 
@@ -66,79 +90,140 @@ class RuleOcr:
 
         return screenshot[y: y + h, x: x + w]
 
-    def ocr_full(self, screenshot, keyword: Optional[str] = None) -> Tuple[int, int, int, int]:
+    def ocr(self, screenshot, keyword: Optional[str] = None, frame_id: int = 0) -> OcrResult:
         """
-        检测整个图片的文本,并对结果进行过滤。返回的是匹配到的keyword的左边。如果没有匹配到返回(0, 0, 0, 0)
-        :param screenshot: 要检测的图片
+        检测整个 area 的文本并和 keyword 匹配, 不修改 roi
+        :param screenshot: 要检测的图片或者 Frame
         :param keyword: 要匹配的关键词，如果为None则使用self.keyword
-        :return: 匹配到的区域坐标 (x, y, width, height)
+        :param frame_id: 截图的帧编号, 记录在结果里, 传入 Frame 时默认使用 Frame 的编号
+        :return: OcrResult, roi 是匹配到的文字区域, 没有匹配到时为 (0, 0, 0, 0)
         """
         if keyword is None:
             keyword = self.keyword
+        _, frame = unwrap(screenshot)
+        if frame is not None and not frame_id:
+            frame_id = frame.frame_id
 
-        new_area = 0, 0, 0, 0
         boxed_results = self.detect_and_ocr(screenshot)
         if not boxed_results:
-            return new_area
+            return OcrResult(self.name, keyword, (0, 0, 0, 0), frame_id)
 
         logger.background(f"<OCR> boxed_results: {boxed_results}")
-        # 如果一个都没有匹配到
-        if not boxed_results:
-            return new_area
 
-        logger.background(f"<OCR> boxed_results: {boxed_results}")
-
-        # 如果匹配到了多个,则合并所有的坐标，返回合并后的坐标
-        if len(boxed_results) > 1:
+        area_list = [(
+            int(cast(np.ndarray, result.box)[0][0]),  # x
+            int(cast(np.ndarray, result.box)[0][1]),  # y
+            int(cast(np.ndarray, result.box)[1][0] - cast(np.ndarray, result.box)[0][0]),  # width
+            int(cast(np.ndarray, result.box)[2][1] - cast(np.ndarray, result.box)[0][1]),  # height
+        ) for result in boxed_results]
+        # 如果匹配到了多个,则合并所有的坐标
+        if len(area_list) > 1:
             logger.info(f"<OCR> Going to merge areas.")
-            area_list = [(
-                int(cast(np.ndarray, result.box)[0][0]),  # x
-                int(cast(np.ndarray, result.box)[0][1]),  # y
-                int(cast(np.ndarray, result.box)[
-                    # width
-                    1][0] - cast(np.ndarray, result.box)[0][0]),
-                int(cast(np.ndarray, result.box)[
-                    # height
-                    2][1] - cast(np.ndarray, result.box)[0][1]),
-            ) for result in boxed_results]
-            area = merge_area(area_list)
-            self.roi = int(area[0] + self.roi[0]), int(area[1] +
-                                                       self.roi[1]), int(self.roi[2]), int(self.roi[3])
-            new_area = int(area[0] + self.roi[0]), int(area[1] +
-                                                       self.roi[1]), int(self.area[2]), (self.area[3])
+            box = merge_area(area_list)
         else:
             logger.info(f"<OCR> Found single area.")
-            box = cast(np.ndarray, boxed_results[0].box)
-            self.roi = int(box[0][0] + self.roi[0]), int(box[0][1] + self.roi[1]
-                                                         ), self.roi[2], self.roi[3]
-            new_area = int(box[0][0] + self.roi[0]), int(box[0][1] + self.roi[1]
-                                                         ), self.area[2], self.area[3]
-        logger.background(
-            f"<OCR> [{keyword if keyword else self.name}] detected in new area: {new_area}, roi: {self.roi}")
-
-        # 测试用
-        # logger.warning(str(new_area))
-        # target_rectangle_color = (101, 67, 196)
-        # cv2.rectangle(screenshot, (self.roi[0], self.roi[1]),
-        #               (self.roi[0] + self.roi[2], self.roi[1] + self.roi[3]), target_rectangle_color, 2)
-        # cv2.imwrite(f'{Path.cwd()}/buff_output.png', screenshot)
-        return new_area
+            box = area_list[0]
+
+        # 检测的是 area 截取的图片, 加上 area 的偏移
+        roi = int(box[0] + self.area[0]), int(box[1] + self.area[1]), int(box[2]), int(box[3])
+        logger.background(f"<OCR> [{keyword if keyword else self.name}] detected in: {roi}")
+        return OcrResult(self.name, keyword, roi, frame_id)
+
+    def ocr_full(self, screenshot, keyword: Optional[str] = None) -> Tuple[int, int, int, int]:
+        """
+        兼容旧的用法: 检测整个图片的文本, 匹配到时把位置写回 roi
+        新的代码用 ocr, 点击时直接使用返回的 OcrResult
+        :return: 匹配到的区域坐标 (x, y, width, height), 没有匹配到返回(0, 0, 0, 0)
+        """
+        result = self.ocr(screenshot, keyword)
+        if not result.found:
+            return 0, 0, 0, 0
+
+        # roi 的大小保持不变, 只移动位置
+        self.roi = result.roi[0], result.roi[1], self.roi[2], self.roi[3]
+        return result.roi[0], result.roi[1], self.area[2], self.area[3]
+
+    def read_digits(self, image: np.ndarray) -> Optional[tuple[str, float]]:
+        """
+        用字形模板读取数字
+        :param image: 截取之后的区域
+        :return: (文字, 置信度), 置信度不够或者不是数字资源时返回None
+        """
+        reader = digit_reader.digit_reader()
+        if not self.digits or not reader.ready:
+            return None
+        text, confidence = reader.read(image)
+        if confidence < digit_reader.MIN_CONFIDENCE:
+            logger.background(f"<ocr> {self.name} digits low confidence: {text} ({confidence:.2f})")
+            return None
+        logger.background(f"<ocr> {self.name} digits: {text} ({confidence:.2f})")
+        return text, confidence
 
     def ocr_single(self, screenshot) -> str:
         screenshot = self.crop(screenshot)
-        res = text_sys.ocr_single_line(screenshot)
-        if res is None:
+        digits = self.read_digits(screenshot)
+        if digits is not None:
+            return digits[0]
+        # 同样的图片直接用上次的识别结果
+        res = ocr_cache().cached(OcrCache.key('line', screenshot),
+                                 lambda: self.model.ocr_single_line(screenshot) or ("", 0.))
+        if not res[0]:
             logger.warning(f"<ocr> No result found")
             return ""
         logger.info(f"<ocr> result: {res[0]}")
         return res[0]
 
-    def digit_counter(self, screenshot) -> list:
-        result = self.ocr_single(screenshot)
-        if result == "":
+    @staticmethod
+    def batch_read(rules: list['RuleOcr'], screenshot) -> dict['RuleOcr', tuple[str, float]]:
+        """
+        多个区域的单行文字一起识别, 识别模型一次推理处理所有区域
+        每个区域和 ocr_single 一样截取, 识别模型内部统一补齐宽度和归一化
+        :param screenshot: 截图或者 Frame, 所有区域都从这一帧截取
+        :return: {RuleOcr: (文字, 置信度)}, 没有识别到时为 ("", 0.)
+        """
+        if not rules:
+            return {}
+        cache = ocr_cache()
+        crops = [rule.crop(screenshot) for rule in rules]
+        keys = [OcrCache.key('line', crop) for crop in crops]
+        # 和 ocr_single 共用缓存, 只识别没有缓存的区域
+        results = []
+        for rule, crop, key in zip(rules, crops, keys):
+            digits = rule.read_digits(crop)
+            results.append(digits if digits is not None else cache.get(key))
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            start = time.perf_counter()
+            recognized = ocr_engine.engine().ocr_lines([crops[index] for index in missing]) or []
+            cost = (time.perf_counter() - start) / len(missing)
+            for order, index in enumerate(missing):
+                result = recognized[order] if order < len(recognized) and recognized[order] else ("", 0.)
+                results[index] = (result[0], float(result[1]))
+                cache.set(keys[index], results[index], cost)
+
+        texts = {}
+        for rule, (text, score) in zip(rules, results):
+            texts[rule] = (text, float(score))
+            logger.background(f"<ocr> {rule.name} result: {text} ({float(score):.3f})")
+        return texts
+
+    @staticmethod
+    def parse_digit(text: str) -> int:
+        """
+        文字里所有的数字拼起来, 没有数字返回0
+        """
+        result = ''.join(re.findall(r'\d+', text))
+        return int(result) if result else 0
+
+    @staticmethod
+    def parse_counter(text: str) -> list:
+        """
+        解析 "数量/总数", 格式不对返回 [0, 0]
+        """
+        if text == "":
             return [0, 0]
 
-        result = re.search(r'(\d+)/(\d+)', result)
+        result = re.search(r'(\d+)/(\d+)', text)
         if result:
             result = [int(s) for s in result.groups()]
             logger.info(f"ticket ocr result: {result}")
@@ -148,22 +233,19 @@ class RuleOcr:
                     f"realm raid ticket overflow!! Must be something wrong with OCR.")
             return result
         else:
-            logger.warning(f'Unexpected ocr result: {result}')
+            logger.warning(f'Unexpected ocr result: {text}')
             return [0, 0]
 
+    def digit_counter(self, screenshot) -> list:
+        return self.parse_counter(self.ocr_single(screenshot))
+
     def digit(self, image) -> int:
         """
         返回数字
         :param image:
         :return:
         """
-        result = self.ocr_single(image)
-        result = ''.join(re.findall(r'\d+', result))
-
-        if result == "":
-            return 0
-        else:
-            return int(result)
+        return self.parse_digit(self.ocr_single(image))
 
     def enlarge_canvas(self, image):
         """
@@ -180,7 +262,7 @@ class RuleOcr:
                 image, *border, borderType=cv2.BORDER_CONSTANT, value=(0, 0, 0))
         return image
 
-    def detect_and_ocr(self, image) -> list[BoxedResult]:
+    def detect_and_ocr(self, image) -> list['BoxedResult']:
         """
         注意：这里使用了预处理和后处理
         :param image:
@@ -190,8 +272,9 @@ class RuleOcr:
         image = self.crop(image)
         image = self.enlarge_canvas(image)
 
-        # ocr
-        boxed_results: list[BoxedResult] = self.model.detect_and_ocr(image)
+        # ocr, 同样的图片直接用上次的检测结果
+        boxed_results: list['BoxedResult'] = ocr_cache().cached(
+            OcrCache.key('detect', image), lambda: self.model.detect_and_ocr(image))
 
         results = []
         # after proces
@@ -205,7 +288,7 @@ class RuleOcr:
         logger.background(f"<OCR> detect results: {str(results)}")
         return results
 
-    def filter(self, boxed_results: List[BoxedResult], keyword: Optional[str] = None) -> List[int]:
+    def filter(self, boxed_results: List['BoxedResult'], keyword: Optional[str] = None) -> List[int]:
         """
         使用ocr获取结果后和keyword进行匹配. 返回匹配的index list
         :param boxed_results: OCR结果列表
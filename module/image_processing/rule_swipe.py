@@ -1,6 +1,8 @@
 from functools import cached_property
 import numpy as np
 
+from module.image_processing import resolution
+
 class RuleSwipe:
 
     def __init__(self, roi_start: tuple, roi_end: tuple, name: str) -> None:
@@ -16,6 +18,18 @@ class RuleSwipe:
 
         self.interval: int = 8  # 每次移动的间隔时间
 
+        # 1280x720 的坐标, 截图分辨率变化时从这里重新换算
+        self._design_start = tuple(roi_start)
+        self._design_end = tuple(roi_end)
+        resolution.register(self)
+
+    def rescale(self) -> None:
+        """
+        截图分辨率变化时重新换算起点和终点
+        """
+        self.roi_start = resolution.rect(self._design_start)
+        self.roi_end = resolution.rect(self._design_end)
+
     @cached_property
     def name(self) -> str:
         """
@@ -0,0 +1,146 @@
+"""
+模板图集: 把所有 RuleImage 的模板解码后打包成一个文件
+运行时用 np.memmap 打开, RuleImage.image 直接是图集里的一段, 不再逐个读取和解码 png
+同一台机器上的多个进程共用同一份内存页
+
+生成: py -m module.image_processing.template_atlas
+"""
+import json
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from module.base.logger import logger
+
+MODULE_FOLDER = 'tasks'
+ATLAS_FILE = './tasks/template_atlas.bin'
+INDEX_FILE = './tasks/template_atlas.json'
+ATLAS_VERSION = 2
+# 每张模板的起始位置按这个字节数对齐
+ALIGNMENT = 64
+
+def normalize(file: str) -> str:
+    """
+    统一模板路径的写法, './tasks/a.png' 和 'tasks/a.png' 是同一个文件
+    """
+    return Path(file).as_posix().removeprefix('./')
+
+def file_stamp(file: str) -> Optional[list]:
+    """
+    源文件的修改时间和大小, 只读文件信息不读内容, 文件不存在返回None
+    """
+    try:
+        stat = os.stat(file)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def template_files(module_folder: str = MODULE_FOLDER) -> list[str]:
+    """
+    和 assets_extractor 一样遍历所有的 json, 取出 image 类型用到的图片
+    """
+    files = set()
+    for json_file in Path(module_folder).rglob('*.json'):
+        if 'temp' in str(json_file):
+            continue
+        with open(json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            continue
+        for item in data:
+            if isinstance(item, dict) and item.get('type') == 'image' and item.get('file'):
+                files.add(normalize(item['file']))
+    return sorted(files)
+
+def build_atlas(atlas_file: str = ATLAS_FILE, index_file: str = INDEX_FILE) -> int:
+    """
+    生成图集和索引
+    :return: 打包的模板数量
+    """
+    entries = {}
+    offset = 0
+    with open(atlas_file, 'wb') as atlas:
+        for file in template_files():
+            image = cv2.imread(file)
+            if image is None:
+                logger.error(f"[Atlas] Cannot read {file}")
+                continue
+            data = np.ascontiguousarray(image).tobytes()
+            padding = -offset % ALIGNMENT
+            atlas.write(b'\0' * padding)
+            offset += padding
+            atlas.write(data)
+            entries[file] = {
+                'offset': offset,
+                'shape': list(image.shape),
+                'stamp': file_stamp(file),
+            }
+            offset += len(data)
+
+    with open(index_file, 'w', encoding='utf-8', newline='\n') as f:
+        json.dump({'version': ATLAS_VERSION, 'entries': entries}, f, indent=2)
+    logger.info(f"[Atlas] Packed {len(entries)} templates, {offset / 1024 / 1024:.1f}MB")
+    return len(entries)
+
+class TemplateAtlas:
+
+    def __init__(self, atlas_file: str = ATLAS_FILE, index_file: str = INDEX_FILE) -> None:
+        """
+        打开图集, 源文件的修改时间或大小和生成时不一样的模板不使用, 回退到单独读取
+        只比较文件信息, 不在匹配的路径上读取和 hash 所有的 png
+        """
+        self.entries: dict[str, dict] = {}
+        self.stale: set[str] = set()
+        self._data: Optional[np.memmap] = None
+
+        if not Path(atlas_file).is_file() or not Path(index_file).is_file():
+            return
+        with open(index_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != ATLAS_VERSION:
+            logger.warning("[Atlas] Version mismatch, rebuild the template atlas")
+            return
+
+        for file, entry in index['entries'].items():
+            if file_stamp(file) != entry.get('stamp'):
+                self.stale.add(file)
+                continue
+            self.entries[file] = entry
+        if self.stale:
+            logger.warning(f"[Atlas] {len(self.stale)} templates changed since the atlas was built, "
+                           f"rebuild the template atlas")
+        if self.entries:
+            self._data = np.memmap(atlas_file, dtype=np.uint8, mode='r')
+
+    def get(self, file: str) -> Optional[np.ndarray]:
+        """
+        :return: 只读的模板图片, 不在图集里返回None
+        """
+        entry = self.entries.get(normalize(file))
+        if entry is None or self._data is None:
+            return None
+        shape = tuple(entry['shape'])
+        size = int(np.prod(shape))
+        return self._data[entry['offset']: entry['offset'] + size].reshape(shape)
+
+_atlas: Optional[TemplateAtlas] = None
+_lock = Lock()
+
+def atlas() -> TemplateAtlas:
+    """
+    所有 RuleImage 共用的图集, 第一次使用时打开
+    """
+    global _atlas
+    if _atlas is None:
+        with _lock:
+            if _atlas is None:
+                _atlas = TemplateAtlas()
+    return _atlas
+
+
+if __name__ == "__main__":
+    build_atlas()
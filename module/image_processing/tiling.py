@@ -0,0 +1,69 @@
+"""
+大区域的分块并行匹配
+很大的 area 切成几块, 每块在匹配线程池里单独匹配, 再取所有块里最高的峰值
+相邻的块重叠模板大小减一, 每个匹配位置都完整地落在某一块里, 结果和整块匹配一样
+"""
+import cv2
+import numpy as np
+
+from module.image_processing import match_pool
+
+# 搜索区域小于这个像素数时不分块, 线程调度的开销比省下的时间多
+# 分界点用 py -m module.image_processing.benchmark tiled 在实际的机器上测
+TILE_MIN_PIXELS = 200_000
+
+def should_tile(image_shape: tuple, template_shape: tuple) -> bool:
+    """
+    :param image_shape: 截取之后的搜索区域
+    :param template_shape: 模板
+    """
+    if match_pool.MAX_WORKERS <= 1 or match_pool.in_pool():
+        return False
+    h, w = image_shape[:2]
+    return h * w >= TILE_MIN_PIXELS and h >= template_shape[0] and w >= template_shape[1]
+
+def tile_count(image_shape: tuple) -> int:
+    """
+    每块至少 TILE_MIN_PIXELS 的一半, 最多和线程数一样多
+    """
+    h, w = image_shape[:2]
+    return max(1, min(match_pool.MAX_WORKERS, h * w // (TILE_MIN_PIXELS // 2)))
+
+def tiles(image_shape: tuple, template_shape: tuple, count: int) -> list[tuple]:
+    """
+    沿着长边切成 count 块
+    :return: [(x, y, w, h)] 相对搜索区域的坐标
+    """
+    h, w = image_shape[:2]
+    th, tw = template_shape[:2]
+    # 按匹配结果的行 (列) 均分, 每块再往后多取模板大小减一
+    vertical = h - th >= w - tw
+    positions = (h - th + 1) if vertical else (w - tw + 1)
+    count = max(1, min(count, positions))
+    bounds = np.linspace(0, positions, count + 1).astype(int)
+    result = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if vertical:
+            result.append((0, int(start), w, int(end - start) + th - 1))
+        else:
+            result.append((int(start), 0, int(end - start) + tw - 1, h))
+    return result
+
+def match_tiled(image: np.ndarray, template: np.ndarray, count: int = 0) -> tuple:
+    """
+    分块并行匹配
+    :param image: 截取之后的搜索区域
+    :param count: 分成几块, 0 时用 tile_count
+    :return: (最高的匹配度, 相对搜索区域的位置)
+    """
+    count = count or tile_count(image.shape)
+
+    def match(tile) -> tuple:
+        x, y, w, h = tile
+        result = cv2.matchTemplate(image[y: y + h, x: x + w], template, cv2.TM_CCORR_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return max_val, (max_loc[0] + x, max_loc[1] + y)
+
+    peaks = match_pool.parallel_map(match, tiles(image.shape, template.shape, count))
+    # 分数一样时取靠前的一块
+    return max(peaks, key=lambda peak: peak[0])
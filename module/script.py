@@ -17,6 +17,9 @@ from module.base.exception import RequestHumanTakeover, TaskEnd
 from module.base.exception_handler import ExceptionHandler
 from module.control.server.device import Device
 from module.config.config import Config
+from module.image_processing.area_store import area_store
+from module.image_processing import ocr_engine
+from module.image_processing.ocr_cache import ocr_cache
 
 
 class Script:
@@ -91,6 +94,15 @@ class Script:
         try:
             from module.control.server.device import Device
             device = Device(config_name=self.config_name)
+            optimization = device.config.model.script.optimization
+            ocr_cache().configure(optimization.ocr_cache_size, optimization.ocr_cache_ttl)
+            ocr_engine.configure(intra_op_threads=optimization.ocr_intra_op_threads,
+                                 inter_op_threads=optimization.ocr_inter_op_threads,
+                                 graph_optimization=optimization.ocr_graph_optimization,
+                                 execution_mode=optimization.ocr_execution_mode)
+            if optimization.ocr_warm_up:
+                # 连接设备之后在后台加载 OCR 模型, 不阻塞第一个任务
+                ocr_engine.warm_up()
             return device
         except RequestHumanTakeover:
             logger.critical('Request human takeover')
@@ -139,6 +151,8 @@ class Script:
             if isinstance(e, TaskEnd):
                 # 如果没有异常，任务成功完成
                 logger.info(f"任务 {name} 执行成功")
+                self.device.log_stats()
+                area_store().save()
                 # 清除当前任务记录
                 self._current_task = None
                 return True
@@ -357,6 +371,13 @@ class Script:
 
         self.is_running = False
 
+        # 停止后台截图线程
+        if 'device' in self.__dict__:
+            self.device.stop_stream()
+
+        # 保存学习到的匹配区域
+        area_store().save()
+
         # 清理全局实例
         Script._current_instance = None
 
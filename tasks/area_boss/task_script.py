@@ -1,6 +1,7 @@
 
 import time
 from module.base.logger import logger
+from module.image_processing import resolution
 from tasks.components.battle.battle import Battle
 from tasks.components.page.page import page_boss, page_main
 from tasks.area_boss.assets import AreaBossAssets
@@ -67,7 +68,7 @@ class TaskScript(Battle, AreaBossAssets):
             if self.appear(self.I_AB_LV_ROLLER):
                 sx, sy = self.I_AB_LV_ROLLER.roi_center()
                 # 降为1
-                self.device.swipe(sx, sy, 185, 284, 500)
+                self.device.swipe(sx, sy, *resolution.point(185, 284), 500)
 
         # 进入战斗
         while 1:
@@ -17,33 +17,49 @@ class Battle(Buff, SwitchSouls, CleanSouls, BattleAssets):
 
         win = False
 
-        while 1:
-            self.wait_and_shot(0.4)
-            if self.appear(exit_battle_check, 0.95):
-                break
-
-            self.appear_then_click(self.I_BATTLE_READY, 0.95)
-
-            if self.appear(self.I_REWARD) and self.get_reward(exit_battle_check):
-                win = True
-                break
-
-            if win:
-                self.click(self.battle_end_click)  # 特殊奖励情况
-
-            if self.appear(self.I_BATTLE_WIN, 0.95):
-                self.click(self.battle_end_click)
-                win = True
-                continue
-
-            if failed_check and self.appear(failed_check, 0.95):
-                self.click(self.battle_end_click)
-                win = False
-            elif self.appear(self.I_BATTLE_FAILED, 0.95):
-                self.click(self.battle_end_click)
-                win = False
+        checks = [
+            (exit_battle_check, 0.95),
+            (self.I_BATTLE_READY, 0.95),
+            self.I_REWARD,
+            (self.I_BATTLE_WIN, 0.95),
+            (self.I_BATTLE_FAILED, 0.95),
+        ]
+        if failed_check:
+            checks.append((failed_check, 0.95))
+
+        # 战斗中使用战斗截图间隔
+        with self.device.governor.combat():
+            while 1:
+                self.wait_and_shot(0.4)
+                # 一帧只截一次图, 所有的检查一起匹配
+                appeared = {target for target, _ in self.which_appears(checks, engine='fft')}
+                if exit_battle_check in appeared:
+                    break
+
+                if self.I_BATTLE_READY in appeared:
+                    self.click(self.I_BATTLE_READY)
+
+                if self.I_REWARD in appeared and self.get_reward(exit_battle_check):
+                    win = True
+                    break
+
+                if win:
+                    self.click(self.battle_end_click)  # 特殊奖励情况
+
+                if self.I_BATTLE_WIN in appeared:
+                    self.click(self.battle_end_click)
+                    win = True
+                    continue
+
+                if failed_check and failed_check in appeared:
+                    self.click(self.battle_end_click)
+                    win = False
+                elif self.I_BATTLE_FAILED in appeared:
+                    self.click(self.battle_end_click)
+                    win = False
 
         logger.info(f"** Got battle result: {win}")
+        logger.background(f"[MatchCache] {self.device.match_cache.stats}")
         return win
 
     @cached_property
@@ -2,6 +2,7 @@ from module.image_processing.rule_image import RuleImage
 from module.image_processing.rule_ocr import RuleOcr
 from module.image_processing.rule_swipe import RuleSwipe
 from module.image_processing.rule_click import RuleClick
+from module.image_processing.rule_color import RuleColor
 
 # This file was automatically generated by ./module/impage_processing/assets_extractor.py.
 # Don't modify it manually.
@@ -137,4 +138,24 @@ class BuffAssets:
 		name="buff_down"
 	)
 
+	# Color Rule Assets
+	# 已开启的加成开关, 黄色 
+	P_BUFF_SWITCH_YELLOW = RuleColor(
+		name="buff_switch_yellow",
+		roi=(772, 347, 21, 21),
+		area=(766, 133, 35, 366),
+		color=(225, 142, 0),
+		tolerance=30,
+		ratio=0.6
+	)
+	# 已关闭的加成开关, 红色 
+	P_BUFF_SWITCH_RED = RuleColor(
+		name="buff_switch_red",
+		roi=(772, 347, 21, 21),
+		area=(766, 133, 35, 366),
+		color=(179, 11, 38),
+		tolerance=30,
+		ratio=0.6
+	)
+
 
@@ -5,6 +5,7 @@ from pathlib import Path
 from module.base.logger import logger
 from module.image_processing.rule_ocr import RuleOcr
 from module.image_processing.rule_image import RuleImage
+from module.image_processing import resolution
 from tasks.components.buff.assets import BuffAssets
 from tasks.task_base import TaskBase
 from tasks.components.page.page import Page
@@ -67,10 +68,9 @@ class Buff(TaskBase, BuffAssets):
                 logger.info(f'No {buff.name} buff')
                 return None
 
-        x = 775  # 开关最左边
-        y = max(0, buff.roi[1] - 10)  # 确保y坐标不为负数
-        w = 80  # 增加开关的宽度
-        h = 80  # 增加开关的高度
+        # 1280x720 的大小, 换算到截图坐标
+        x, offset, w, h = resolution.rect((775, 10, 80, 80))  # 开关最左边, 向上的偏移, 开关的宽度和高度
+        y = max(0, buff.roi[1] - offset)  # 确保y坐标不为负数
 
         logger.info(
             f"Get target area: {(x, y, w, h)}")
@@ -88,26 +88,26 @@ class Buff(TaskBase, BuffAssets):
         :param area:
         :return:
         """
-        self.I_BUFF_OPEN_YELLOW.area = tuple(area)  # 动态设置area
-        self.I_BUFF_CLOSE_RED.area = tuple(area)
+        self.P_BUFF_SWITCH_YELLOW.area = tuple(area)  # 动态设置area
+        self.P_BUFF_SWITCH_RED.area = tuple(area)
 
     def toggle_buff(self, activate: bool = True):
         if activate:
             logger.info("Activating buff")
             while 1:
                 self.wait_and_shot()
-                if not self.appear(self.I_BUFF_CLOSE_RED, 0.95):
+                if not self.appear(self.P_BUFF_SWITCH_RED):
                     return
 
-                self.appear_then_click(self.I_BUFF_CLOSE_RED)
+                self.appear_then_click(self.P_BUFF_SWITCH_RED)
         else:
             logger.info("Deactivating buff")
             while 1:
                 self.wait_and_shot()
-                if not self.appear(self.I_BUFF_OPEN_YELLOW, 0.95):
+                if not self.appear(self.P_BUFF_SWITCH_YELLOW):
                     return
 
-                self.appear_then_click(self.I_BUFF_OPEN_YELLOW)
+                self.appear_then_click(self.P_BUFF_SWITCH_YELLOW)
 
     def awake(self, activate: bool = True):
         """
@@ -208,9 +208,9 @@ class Buff(TaskBase, BuffAssets):
         if not self.appear(target):
             logger.warning(f'No {target.name} buff')
             return None
-        x = int(target.roi_center()[0] + 364)
+        offset, _, w, _ = resolution.rect((364, 0, 80, 0))  # 1280x720 的距离, 换算到截图坐标
+        x = int(target.roi_center()[0] + offset)
         y = int(target.roi[1])
-        w = 80
         h = int(target.roi[3])
 
         # # 测试用
@@ -15,9 +15,18 @@ from tasks.subaccounts.assets import SubaccountsAssets
 from module.image_processing.rule_click import RuleClick
 from module.image_processing.rule_image import RuleImage
 from module.image_processing.rule_ocr import RuleOcr
+from module.image_processing.rule_color import RuleColor
+from module.image_processing.match_result import MatchResult, OcrResult
+from module.image_processing.frame import Frame
 from module.image_processing.rule_swipe import RuleSwipe
+from module.image_processing.match_pool import parallel_map
+from module.image_processing.match_engine import get_engine
+from module.image_processing.pixel_probe import PixelProbe
+from module.image_processing import fingerprint
+from module.image_processing import resolution
 from module.base.logger import logger
 from module.base.timer import Timer
+from module.base.burst import BurstHandler
 from module.base.exception import RequestHumanTakeover
 
 class Controls(PageAssets, SubaccountsAssets, PageMap, WidgetsAssets):
@@ -31,14 +40,49 @@ class Controls(PageAssets, SubaccountsAssets, PageMap, WidgetsAssets):
 
         self.start_time = datetime.now()  # 启动的时间
 
+        # 突发事件, 任务可以用 register_burst 添加自己的处理
+        self.burst_handlers: list[BurstHandler] = []
+        self._in_burst = False
+        self.register_burst(BurstHandler(
+            'invitation', self.check_request_invitation,
+            probe=PixelProbe.from_rule(self.I_QUEST_ACCEPT).check,
+            min_interval=1.0))
+
+    def register_burst(self, handler: BurstHandler) -> None:
+        """
+        添加突发事件处理, 同名的会被替换
+        """
+        self.remove_burst(handler.name)
+        self.burst_handlers.append(handler)
+
+    def remove_burst(self, name: str) -> None:
+        self.burst_handlers = [h for h in self.burst_handlers if h.name != name]
+
     def _burst(self) -> bool:
         """
         游戏界面突发异常检测
+        每个处理器按自己的最短间隔检查, 先用探针预判, 命中了才做完整的确认和处理
         :return: 没有出现返回False, 其他True
         """
+        if self._in_burst or self.image is None:
+            return False
 
-        self.check_request_invitation()
-        return True
+        self._in_burst = True
+        handled = False
+        try:
+            now = time.time()
+            for handler in self.burst_handlers:
+                if not handler.due(now):
+                    continue
+                start = time.time()
+                if not handler.probe_hit(self.image):
+                    self.device.burst_time.add(f"{handler.name}.probe", time.time() - start)
+                    continue
+                handled = handler.handle() or handled
+                self.device.burst_time.add(f"{handler.name}.handle", time.time() - start)
+        finally:
+            self._in_burst = False
+        return handled
 
     @cached_property
     def ui_close(self):
@@ -63,10 +107,8 @@ class Controls(PageAssets, SubaccountsAssets, PageMap, WidgetsAssets):
         click_button = self.I_QUEST_IGNORE
         accept_quests = [self.I_QUEST_JADE, self.I_QUEST_CAT, self.I_QUEST_DOG]
 
-        for quest in accept_quests:
-            if self.appear(quest, 0.96):
-                click_button = self.I_QUEST_ACCEPT
-                break
+        if self.appear_any(accept_quests, 0.96, engine='fft'):
+            click_button = self.I_QUEST_ACCEPT
 
         while 1:
             self.device.get_screenshot()
@@ -79,14 +121,215 @@ class Controls(PageAssets, SubaccountsAssets, PageMap, WidgetsAssets):
 
         return True
 
-    def appear(self, target: RuleImage, threshold: float = 0.9, delay: float = 0.1) -> bool:
-        if not isinstance(target, RuleImage):
+    def current_frame(self) -> Frame:
+        """
+        当前帧, 还没有截图时先截图
+        识别时传入 Frame, 所有资源共用这一帧的灰度图和缩小图
+        """
+        if self.device.frame is None:
+            self.screenshot()
+        return self.device.frame
+
+    def appear(self, target: Union[RuleImage, RuleColor], threshold: float = 0.9, delay: float = 0.1,
+               engine: Optional[str] = None) -> bool:
+        """
+        :param engine: 匹配后端, 见 match_engine, 默认 opencv
+        """
+        if not isinstance(target, (RuleImage, RuleColor)):
             return False
-        time.sleep(0.1)
-        screenshot = self.device.screenshot
-        if screenshot is None:
-            screenshot = self.screenshot()
-        return target.match_target(screenshot, threshold)
+        return target.match_target(self.current_frame(), threshold, cache=self.device.match_cache,
+                                   engine=engine)
+
+    def match(self, target: Union[RuleImage, RuleColor], threshold: float = 0.9,
+              engine: Optional[str] = None) -> MatchResult:
+        """
+        在当前帧里匹配, 返回不可变的结果, 不修改 target.roi
+        点击时直接传入结果: self.click(result)
+        """
+        return target.match(self.current_frame(), threshold, cache=self.device.match_cache, engine=engine)
+
+    def which_appears(self, targets: list, threshold: float = 0.9,
+                      engine: Optional[str] = None) -> list[tuple[RuleImage, float]]:
+        """
+        在同一帧里一次性检查多个图片, 匹配在线程池里并行执行
+        Args:
+            targets (list): RuleImage, RuleColor 或 (RuleImage, threshold) 的列表
+            threshold (float, optional): 没有单独指定阈值时使用. Defaults to 0.9.
+            engine (str, optional): 匹配后端, fft 会把同一区域的图片放在一起匹配. Defaults to opencv.
+
+        Returns:
+            list: 出现了的 (RuleImage, 匹配度), 按输入的顺序
+        """
+        frame = self.current_frame()
+        cache = self.device.match_cache
+
+        order = []
+        checks = []
+        colors = []
+        for item in targets:
+            target, target_threshold = item if isinstance(item, tuple) else (item, threshold)
+            if isinstance(target, RuleImage):
+                area = target.search_area
+                key = cache.key(target.name, area)
+                checks.append((target, target_threshold, area, key, cache.get(key)))
+                order.append(target)
+            elif isinstance(target, RuleColor):
+                colors.append(target)
+                order.append(target)
+
+        # 先在上次的位置直接匹配, 没有命中的再在整个区域里搜索
+        fast = {}
+        for target, target_threshold, area, _, result in checks:
+            if result is None:
+                fast[target] = target.match_fast(frame, target_threshold, area)
+
+        missing = [(target, area) for target, _, area, _, result in checks
+                   if result is None and fast[target] is None]
+        scores = self.match_scores(frame, missing, engine)
+
+        appeared = {}
+        for target, target_threshold, area, key, result in checks:
+            if result is None and fast[target] is not None:
+                result = fast[target]
+            elif result is None:
+                result = scores[target]
+                cache.set(key, result)
+            hit = target.accept(result, target_threshold)
+            if not hit and target.learned_miss(area):
+                # 学习到的区域里没有, 在完整的区域里再找一次
+                result = target.match_score(frame, engine=engine)
+                cache.set(cache.key(target.name, target.area), result)
+                hit = target.accept(result, target_threshold)
+            if hit:
+                appeared[target] = result[0]
+
+        # 颜色规则只比较像素, 不需要放进线程池
+        for target in colors:
+            result = target.match(frame, cache=cache)
+            if result.found:
+                target.remember(result)
+                appeared[target] = result.score
+        return [(target, appeared[target]) for target in order if target in appeared]
+
+    @staticmethod
+    def match_scores(frame: Frame, missing: list, engine: Optional[str] = None) -> dict:
+        """
+        在搜索区域里匹配, 在线程池里并行执行
+        支持批量的后端按区域分组, 同一区域的图片一起匹配
+        :param missing: [(RuleImage, area)]
+        :return: {RuleImage: match_score 的结果}
+        """
+        if not get_engine(engine).batched:
+            return dict(zip([target for target, _ in missing], parallel_map(
+                lambda item: item[0].match_score(frame, area=item[1], engine=engine), missing)))
+
+        groups: dict[tuple, list] = {}
+        for target, area in missing:
+            groups.setdefault(tuple(area), []).append(target)
+        scores = {}
+        for result in parallel_map(lambda group: RuleImage.match_score_many(frame, group[1], group[0], engine),
+                                   list(groups.items())):
+            scores.update(result)
+        return scores
+
+    def appear_any(self, targets: list, threshold: float = 0.9,
+                   engine: Optional[str] = None) -> Optional[RuleImage]:
+        """
+        同一帧里检查多个图片, 返回第一个出现的, 都没有出现返回None
+        """
+        appeared = self.which_appears(targets, threshold, engine)
+        return appeared[0][0] if appeared else None
+
+    def wait_for(self, conditions: list, timeout: float = 5,
+                 min_interval: float = 0.05, max_interval: float = 0.5,
+                 threshold: float = 0.9):
+        """等待任意一个条件成立，有新画面就马上检查，画面静止时逐渐放慢
+
+        Args:
+            conditions (list): RuleImage, RuleColor, (RuleImage, threshold) 或者无参数返回bool的函数
+            timeout (float, optional): waiting time limit (s). Defaults to 5.
+            min_interval (float, optional): 画面变化时的检查间隔. Defaults to 0.05.
+            max_interval (float, optional): 画面静止时最长的检查间隔. Defaults to 0.5.
+            threshold (float, optional): Defaults to 0.9.
+
+        Returns:
+            成立的条件, 超时返回None
+        """
+        images = [c for c in conditions if not callable(c)]
+        checks = [c for c in conditions if callable(c)]
+
+        timer = Timer(timeout).start()
+        interval = min_interval
+        prev = None
+        while 1:
+            # 开启后台截图时会等到比上一帧和上一次点击更新的画面
+            # 检查间隔由这里控制, 截图不再经过频率控制的等待
+            with self.device.governor.exempt():
+                self.screenshot(newer_than=max(self.device.screenshot_time, self.device.input_time))
+            appeared = self.which_appears(images, threshold)
+            if appeared:
+                return appeared[0][0]
+            for check in checks:
+                if check():
+                    return check
+
+            if timer.reached():
+                return None
+
+            curr = fingerprint.thumbnail(self.device.screenshot)
+            if prev is not None and not fingerprint.changed(prev, curr):
+                interval = min(interval * 2, max_interval)
+            else:
+                interval = min_interval
+            prev = curr
+            time.sleep(min(interval, max(0., timeout - timer.current_waiting_time())))
+
+    def wait_until_stable(self, target: Union[RuleImage, RuleClick], limit: float = 0.5) -> bool:
+        """等待目标区域的画面不再变化，比如按钮的弹出动画
+
+        Args:
+            target (RuleImage | RuleClick):
+            limit (float, optional): waiting time limit (s). Defaults to 0.5.
+        """
+        x, y, w, h = target.roi
+        if w <= 0 or h <= 0 or self.device.screenshot is None:
+            return True
+
+        def region():
+            return fingerprint.thumbnail(self.device.screenshot[y: y + h, x: x + w])
+
+        prev = [region()]
+
+        def stable() -> bool:
+            curr = region()
+            last, prev[0] = prev[0], curr
+            return not fingerprint.changed(last, curr)
+
+        return self.wait_for([stable], timeout=limit) is not None
+
+    def region_fingerprint(self, area):
+        """当前画面中 area 区域的指纹, 用于 area_changed / wait_until_changed"""
+        if self.device.screenshot is None:
+            self.screenshot()
+        return self.device.match_cache.region(area)
+
+    def area_changed(self, area, since) -> bool:
+        """
+        当前画面中 area 区域和之前的指纹 since 相比是否有变化
+        """
+        return since is None or self.device.match_cache.changed(area, since)
+
+    def wait_until_changed(self, area, timeout: float = 5, max_interval: float = 1) -> bool:
+        """等待画面中 area 区域发生变化，画面不变时不会做任何模板匹配
+
+        Args:
+            area (tuple): (x, y, w, h)
+            timeout (float, optional): waiting time limit (s). Defaults to 5.
+            max_interval (float, optional): 画面静止时最长的检查间隔. Defaults to 1.
+        """
+        since = self.region_fingerprint(area)
+        return self.wait_for([lambda: self.area_changed(area, since)],
+                             timeout=timeout, max_interval=max_interval) is not None
 
     def wait_and_shot(self, wait_time=0.3):
         time.sleep(wait_time)
@@ -107,16 +350,17 @@ class Controls(PageAssets, SubaccountsAssets, PageMap, WidgetsAssets):
         Args:
             target (RuleImage): 
             limit (float, optional): waiting time limit (s). Defaults to 5.
-            interval (float, optional): interval between retry. Defaults to 0.4.
-            delay (float, optional): Defaults to 0.5.
-            wait_after (float, optional): Defaults to 0.8.
+            interval (float, optional): 画面静止时最长的检查间隔. Defaults to 0.3.
+            delay (float, optional): 点击前最多等待按钮稳定的时间. Defaults to 0.3.
+            wait_after (float, optional): 点击后最多等待画面响应的时间. Defaults to 0.5.
             threshold (float, optional): Defaults to 0.9.
         """
 
         if self.wait_until_appear(target, limit, interval, threshold=threshold):
-            time.sleep(delay)
-            self.appear_then_click(target)
-            time.sleep(wait_after)
+            self.wait_until_stable(target, delay)
+            if self.appear(target, threshold=threshold):
+                # 点击后画面有响应就返回, 最多等 wait_after
+                self.click(target, confirm=True, timeout=wait_after)
             return True
 
         logger.critical(f"Not able to find and click {target.name}.")
@@ -124,40 +368,39 @@ class Controls(PageAssets, SubaccountsAssets, PageMap, WidgetsAssets):
             f"Not able to find and click {target.name}.")
 
     def wait_until_appear(self,
-                          target: RuleImage, limit: float = 5,
+                          target: Union[RuleImage, RuleColor], limit: float = 5,
                           interval: float = 0.4, threshold: float = 0.9
                           ) -> bool:
         """等待出现了再点击，比如需要等过场动画，减少不必要的运行消耗
         Args:
-            target (RuleImage):
+            target (RuleImage | RuleColor):
             limit (float, optional): waiting time limit (s). Defaults to 3.
-            interval (float, optional): interval between retry. Defaults to 0.4.
+            interval (float, optional): 画面静止时最长的检查间隔. Defaults to 0.4.
             threshold (float, optional): Defaults to 0.9.
         """
-        if not isinstance(target, RuleImage):
+        if not isinstance(target, (RuleImage, RuleColor)):
             return False
 
-        timeout = Timer(limit + interval, 2).start()
-        while not timeout.reached():
-            time.sleep(interval)
-            self.screenshot()
-            if self.appear(target, threshold=threshold):
-                return True
-        return False
+        return self.wait_for([(target, threshold)], timeout=limit, max_interval=interval) is not None
 
     def appear_then_click(self,
-                          target: RuleImage,
+                          target: Union[RuleImage, RuleColor],
                           threshold: float = 0.9,
                           delay: float = 0.1
                           ) -> bool:
         """出现就点击，用于会移动的怪物/图标
         Args:
-            target (RuleImage): _description_
-            threshold (float, optional): _description_. Defaults to 0.9.
+            target (RuleImage | RuleColor): _description_
+            threshold (float, optional): _description_. Defaults to 0.9. 颜色规则使用自己的 ratio
         """
-        if self.appear(target, threshold=threshold):
-            time.sleep(delay)
-            self.click(target)
+        if not isinstance(target, (RuleImage, RuleColor)):
+            return False
+        result = self.match(target, threshold)
+        if result.found:
+            target.remember(result)
+            if delay > 0:
+                time.sleep(delay)
+            self.click(result)
             return True
 
         return False
@@ -170,20 +413,16 @@ class Controls(PageAssets, SubaccountsAssets, PageMap, WidgetsAssets):
             pass_t (RuleImage):
             fail_t (RuleImage):
             limit (float, optional):. Defaults to 10.
-            interval (float, optional):. Defaults to 0.4.
+            interval (float, optional): 画面静止时最长的检查间隔. Defaults to 0.4.
         """
 
-        timeout = Timer(limit).start()
-        while not timeout.reached():
-            time.sleep(interval)
-
-            self.screenshot()
-            if self.appear(pass_t):
-                logger.info(f"---- Got Action Success Target: {pass_t.name}")
-                return True
-            if self.appear(fail_t):
-                logger.info(f"---- Got Action failed Target: {fail_t.name}")
-                return False
+        result = self.wait_for([pass_t, fail_t], timeout=limit, max_interval=interval)
+        if result is pass_t:
+            logger.info(f"---- Got Action Success Target: {pass_t.name}")
+            return True
+        if result is fail_t:
+            logger.info(f"---- Got Action failed Target: {fail_t.name}")
+            return False
 
         logger.warning(
             f"Wait until appear {pass_t.name} or {fail_t.name} timeout")
@@ -191,15 +430,19 @@ class Controls(PageAssets, SubaccountsAssets, PageMap, WidgetsAssets):
         raise RequestHumanTakeover(
             f"Wait until appear {pass_t.name} or {fail_t.name} timeout")
 
-    def screenshot(self):
+    def screenshot(self, newer_than: Optional[float] = None):
         """截图 引入中间函数的目的是 为了解决如协作的这类突发的事件
 
+        Args:
+            newer_than (float, optional): 开启后台截图时等待比这个时间戳更新的画面
+
         Returns:
             np.array: image
         """
-        self.image = self.device.get_screenshot()
-        # 判断突发事件
-        self._burst()
+        self.image = self.device.get_screenshot(newer_than)
+        # 判断突发事件, 处理过之后画面已经变了
+        if self._burst():
+            self.image = self.device.screenshot
         return self.image
 
     def swipe(self, swipe: RuleSwipe, duration: int = 400) -> None:
@@ -218,31 +461,77 @@ class Controls(PageAssets, SubaccountsAssets, PageMap, WidgetsAssets):
         self.device.swipe(start_x=sx, start_y=sy, end_x=ex,
                           end_y=ey, duration=duration)
 
-    def click(self, target: Union[RuleImage, RuleClick]):
+    def click(self, target: Union[RuleImage, RuleClick, MatchResult, OcrResult],
+              confirm: bool = False, expect: Optional[RuleImage] = None,
+              timeout: float = 0.5) -> bool:
         """click
 
         Args:
-            target (RuleImage):
-            interval (float, optional): Defaults to None.
+            target (RuleImage | RuleClick | MatchResult | OcrResult): 传入识别结果时点击结果里的位置
+            confirm (bool, optional): 确认点击模式, 点击区域的画面变化后马上返回, 不再固定等待0.5s.
+            expect (RuleImage, optional): 点击后应该出现的图片, 出现就返回. 设置后自动开启确认模式.
+            timeout (float, optional): 确认模式下最长的等待时间. Defaults to 0.5.
 
         Returns:
-            bool:
+            bool: 确认模式下是否确认到了画面响应, 否则总是True
         """
+        before = self.roi_fingerprint(target) if confirm or expect else None
         x, y = target.coord()
         self.device.click(x=x, y=y, name=target.name)
-        time.sleep(0.5)
+        if before is None:
+            time.sleep(0.5)
+            return True
+        return self.confirm_click(target, before, expect, timeout)
 
-    def long_click(self, target: Union[RuleImage, RuleClick]) -> None:
+    def long_click(self, target: Union[RuleImage, RuleClick, MatchResult, OcrResult],
+                   confirm: bool = False, expect: Optional[RuleImage] = None,
+                   timeout: float = 0.5) -> bool:
         """
-        :param control_name:
-        :param x:
-        :param y:
-        :param duration: 单位是s
+        :param target:
+        :param confirm: 确认点击模式, 同 click
+        :param expect: 点击后应该出现的图片
+        :param timeout: 确认模式下最长的等待时间
         :return:
         """
+        before = self.roi_fingerprint(target) if confirm or expect else None
         x, y = target.coord()
         self.device.long_click(x, y)
-        time.sleep(0.5)
+        if before is None:
+            time.sleep(0.5)
+            return True
+        return self.confirm_click(target, before, expect, timeout)
+
+    def roi_fingerprint(self, target: Union[RuleImage, RuleClick, MatchResult, OcrResult]):
+        """
+        当前画面中目标roi区域的指纹, 没有画面或者roi无效返回None
+        """
+        x, y, w, h = target.roi
+        if self.device.screenshot is None or w <= 0 or h <= 0:
+            return None
+        return fingerprint.thumbnail(self.device.screenshot[y: y + h, x: x + w])
+
+    def confirm_click(self, target: Union[RuleImage, RuleClick, MatchResult, OcrResult], before,
+                      expect: Optional[RuleImage] = None, timeout: float = 0.5) -> bool:
+        """
+        等待点击得到画面响应: roi区域变化或者 expect 出现, 并记录响应时间
+        :param before: 点击前roi区域的指纹
+        :return: 超时返回False
+        """
+        start = time.time()
+        conditions = []
+        if expect is not None:
+            conditions.append(expect)
+        if before is not None:
+            conditions.append(lambda: fingerprint.changed(before, self.roi_fingerprint(target)))
+
+        if self.wait_for(conditions, timeout=timeout) is None:
+            logger.background(f"[Click] {target.name} no response in {timeout}s")
+            return False
+
+        cost = time.time() - start
+        self.device.click_ack.add(target.name, cost)
+        logger.background(f"[Click] {target.name} acknowledged in {cost:.3f}s")
+        return True
 
     def find_ocr_target(self, target: RuleOcr) -> bool:
         """
@@ -258,12 +547,14 @@ class Controls(PageAssets, SubaccountsAssets, PageMap, WidgetsAssets):
         :param action:
         :return:
         """
-        if not self.find_ocr_target(target):
+        self.screenshot()
+        result = target.ocr(self.device.frame)
+        if not result.found:
             return False
-        self.ocr_click(target)
+        self.ocr_click(result)
         return True
 
-    def ocr_click(self, target: RuleOcr):
+    def ocr_click(self, target: Union[RuleOcr, OcrResult]):
         x, y = target.coord()
         self.device.click(x, y, target.name)
 
@@ -271,8 +562,7 @@ class Controls(PageAssets, SubaccountsAssets, PageMap, WidgetsAssets):
         """Perform random click within screen
         """
         time.sleep(click_delay)
-        x = np.random.randint(990, 1260)
-        y = np.random.randint(180, 550)
+        x, y = resolution.point(np.random.randint(990, 1260), np.random.randint(180, 550))
         self.device.click(x=x, y=y, name="Random click right")
 
     def click_until_disappear(self, target: RuleImage, interval: float = 1):
@@ -294,11 +584,11 @@ class Controls(PageAssets, SubaccountsAssets, PageMap, WidgetsAssets):
         点击静态的图标，比如按钮
         """
         for _ in range(retry):
-            self.wait_and_shot()
+            self.screenshot()
             if not self.appear(target, threshold=threshold):
                 return True
-            self.appear_then_click(target, threshold=threshold)
-            time.sleep(delay)
+            # 确认点击: 图标所在区域变化 (图标消失) 就马上返回, 不再固定等待0.5s
+            self.click(target, confirm=True, timeout=delay)
         return False
 
     def click_moving_target(self, target: RuleImage, fail_check: RuleImage, threshold: float = 0.9, retry: int = 3):
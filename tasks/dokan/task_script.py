@@ -67,27 +67,29 @@ class TaskScript(Battle, DokanAssets):
         self.class_logger(self.name, "Start dokan battle process")
         win = True
 
-        while 1:
-            self.wait_and_shot(0.4)
-            if self.appear(self.I_DK_PAGE_HEADER, 0.95):
-                break
-
-            if self.appear_then_click(self.I_BATTLE_READY, 0.95):
-                self.click(self.C_SHIKI_LEFT_1)
-
-            if self.appear(self.I_REWARD):
-                self.get_reward()
-                win = True
-                continue
-
-            if self.appear(self.I_BATTLE_WIN, 0.95):
-                self.click(self.battle_end_click)
-                win = True
-                continue
-
-            if self.appear(self.I_BATTLE_FAILED, 0.95):
-                self.click(self.battle_end_click)
-                win = False
+        # 战斗中使用战斗截图间隔
+        with self.device.governor.combat():
+            while 1:
+                self.wait_and_shot(0.4)
+                if self.appear(self.I_DK_PAGE_HEADER, 0.95):
+                    break
+
+                if self.appear_then_click(self.I_BATTLE_READY, 0.95):
+                    self.click(self.C_SHIKI_LEFT_1)
+
+                if self.appear(self.I_REWARD):
+                    self.get_reward()
+                    win = True
+                    continue
+
+                if self.appear(self.I_BATTLE_WIN, 0.95):
+                    self.click(self.battle_end_click)
+                    win = True
+                    continue
+
+                if self.appear(self.I_BATTLE_FAILED, 0.95):
+                    self.click(self.battle_end_click)
+                    win = False
         self.class_logger(self.name, f"** Got battle result: {win}")
         return win
 
@@ -4,6 +4,7 @@ from venv import logger
 from module.base.exception import TaskEnd
 from module.config.enums import DuelTier, OnmyojiClass
 from module.image_processing.rule_image import RuleImage
+from module.image_processing.rule_ocr import RuleOcr
 from tasks.components.battle.battle import Battle
 from tasks.components.page.page import page_dojo, page_main
 from tasks.duel.assets import DuelAssets
@@ -83,7 +84,7 @@ class TaskScript(Battle, DuelAssets):
 
         while 1:
             if self.appear(self.I_DUEL_FIGHT_BLUE, 0.985):
-                if self.check_points() and self.check_score(target_score):
+                if self.check_points_and_score(target_score):
                     return True
 
             self.battle_process()
@@ -95,6 +96,21 @@ class TaskScript(Battle, DuelAssets):
             self.name, f"current score: {score}, target: {target}")
         return score > target
 
+    def check_points_and_score(self, target):
+        """
+        同 check_points() and check_score(target), 荣誉点和分数一次识别
+        """
+        if not self.duel_config.full_honor_points:
+            return self.check_score(target)
+
+        image = self.screenshot()
+        texts = RuleOcr.batch_read([self.O_DUEL_POINTS, self.O_DUEL_SCORE], image)
+        points, total = RuleOcr.parse_counter(texts[self.O_DUEL_POINTS][0])
+        score = RuleOcr.parse_digit(texts[self.O_DUEL_SCORE][0])
+        self.class_logger(
+            self.name, f"current points: {points}, total: {total}, score: {score}, target: {target}")
+        return points >= total and score > target
+
     def check_points(self):
         if not self.duel_config.full_honor_points:
             return True
@@ -232,20 +248,22 @@ class TaskScript(Battle, DuelAssets):
         self.run_duel_battle()
 
     def run_duel_battle(self):
-        while 1:
-            self.class_logger(self.name, "Start duel battle.")
-            self.wait_and_shot(0.4)
-            if self.appear(self.page_check, 0.95):
-                break
+        # 战斗中使用战斗截图间隔
+        with self.device.governor.combat():
+            while 1:
+                self.class_logger(self.name, "Start duel battle.")
+                self.wait_and_shot(0.4)
+                if self.appear(self.page_check, 0.95):
+                    break
 
-            self.appear_then_click(self.I_BATTLE_READY, 0.95)
+                self.appear_then_click(self.I_BATTLE_READY, 0.95)
 
-            if self.appear(self.I_REWARD):
-                self.get_reward()
-                continue
+                if self.appear(self.I_REWARD):
+                    self.get_reward()
+                    continue
 
-            if self.appear(self.I_BATTLE_WIN, 0.95) or self.appear(self.I_DUEL_BATTLE_FAILED, 0.95) or self.appear(self.I_DUEL_BATTLE_SHARE, 0.95):
-                self.click(self.battle_end_click)
+                if self.appear(self.I_BATTLE_WIN, 0.95) or self.appear(self.I_DUEL_BATTLE_FAILED, 0.95) or self.appear(self.I_DUEL_BATTLE_SHARE, 0.95):
+                    self.click(self.battle_end_click)
 
     def enter_battle(self):
         count = 0
@@ -5,6 +5,7 @@ import time
 from module.base.logger import logger
 from module.base.exception import TaskEnd
 from module.image_processing.rule_image import RuleImage
+from module.image_processing.rule_ocr import RuleOcr
 from tasks.realm_raid.assets import RealmRaidAssets
 from tasks.components.page.page import page_realm_raid, page_main, page_exp
 from module.base.exception import RequestHumanTakeover
@@ -287,17 +288,16 @@ class TaskScript(RealmRaidAssets, Battle):
 
     def is_downgrad_required(self):
         image = self.screenshot()
-        level = self.O_RAID_PARTITION_1_LV.digit(image)
+        # 三个等级一次识别
+        rules = [self.O_RAID_PARTITION_1_LV, self.O_RAID_PARTITION_3_LV, self.O_RAID_PARTITION_9_LV]
+        texts = RuleOcr.batch_read(rules, image)
+        level, level_3, level_9 = [RuleOcr.parse_digit(texts[rule][0]) for rule in rules]
         downgrad_required = False
 
-        if level > 57:
-            level_3 = self.O_RAID_PARTITION_3_LV.digit(image)
-            if level_3 > 57:
-                level_9 = self.O_RAID_PARTITION_9_LV.digit(image)
-                if level_9 > 57:
-                    self.class_logger(self.name,
-                                      f"----- level_1: {level}, level_3: {level_3}, level_9: {level_9}")
-                    downgrad_required = True
+        if level > 57 and level_3 > 57 and level_9 > 57:
+            self.class_logger(self.name,
+                              f"----- level_1: {level}, level_3: {level_3}, level_9: {level_9}")
+            downgrad_required = True
 
         return downgrad_required
 
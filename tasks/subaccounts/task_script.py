@@ -4,6 +4,7 @@ import time
 from module.base.logger import logger
 from module.base.exception import TaskEnd
 from module.image_processing.rule_image import RuleImage
+from module.image_processing import resolution
 from tasks.components.page.page import page_main
 from tasks.components.switch_account.switch_account import SwitchAccount
 from tasks.daily_routine.task_script import TaskScript as DailyRoutine
@@ -109,7 +110,7 @@ class TaskScript(SwitchAccount, DailyRoutine, Colla, SubaccountsAssets):
         self.close_quest_board()
 
     def check_invite_quest(self, button: RuleImage):
-        x_offset, y_offset, w, h = 30, 116, 190, 90
+        x_offset, y_offset, w, h = resolution.rect((30, 116, 190, 90))
 
         self.wait_and_shot()
         if not self.appear(button, 0.96):
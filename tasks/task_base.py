@@ -58,6 +58,8 @@ class TaskBase(Controls):
         timeout = Timer(5, 20).start()
         logger.info("Getting current page")
 
+        pages = [page for page in self.MAP.keys() if page.check_button is not None]
+        checks = [(page.check_button, 0.95) for page in pages]
         while 1:
             self.screenshot()
 
@@ -65,20 +67,21 @@ class TaskBase(Controls):
             if timeout.reached():
                 break
 
-            for page in self.MAP.keys():
-                if page.check_button is None:
-                    continue
-                if self.check_page_appear(page=page):
+            # 所有页面的检查按钮在同一帧里一起匹配
+            appeared = {target for target, _ in self.which_appears(checks, engine='fft')}
+            for page in pages:
+                if page.check_button in appeared:
                     logger.info(f"[UI]: {page.name}")
                     self.ui_current = page
                     return page
 
             # Try to close unknown page
-            for close in self.ui_close:
-                if self.wait_until_click(close):
-                    logger.warning('Trying to switch to supported page')
-                    timeout = Timer(5, 10).start()
-                time.sleep(0.2)
+            close = self.appear_any(self.ui_close)
+            if close is not None:
+                self.click(close)
+                logger.warning('Trying to switch to supported page')
+                timeout = Timer(5, 10).start()
+            time.sleep(0.2)
         logger.critical("Starting from current page is not supported")
         raise GamePageUnknownError
 
@@ -25,9 +25,8 @@ class WaitingTask(TaskBase):
             f"⏳ 开始执行等待任务，将持续运行 {duration_minutes:.0f} 分钟...")
 
         while time.time() - start_time < duration_seconds:
+            # 截图时会检查邀请任务
             self.screenshot()
-            # 检查邀请任务
-            self.check_request_invitation()
 
             # 短暂休眠，避免过度占用CPU
             time.sleep(1)